@@ -0,0 +1,165 @@
+"""
+Agregados precalculados sobre results: clasificación de pilotos y de
+constructores por temporada y victorias de cada piloto en cada circuito.
+
+Postgres solo sabe refrescar una vista materializada entera (REFRESH
+MATERIALIZED VIEW vuelve a ejecutar toda la consulta), así que en lugar de
+vistas materializadas se usan tablas de resumen (models/standings.py), las
+mismas en Postgres y en SQLite:
+    rebuild() las recalcula desde results con un INSERT ... SELECT por tabla.
+    aplicar_resultados() suma (o resta, al borrar o al sustituir un resultado)
+    la aportación de los resultados escritos con un upsert por tabla, dentro
+    de la misma transacción que la escritura en results.
+Los puntos son la suma de results.points, sin las reglas de descarte de
+algunas temporadas.
+
+Uso:
+    python aggregates.py   # recalcula todas las tablas de agregados
+"""
+
+import logging
+from collections import defaultdict
+
+from sqlalchemy import case, delete, exists, func, insert, select, tuple_
+
+from models.races import RacesTB
+from models.results import ResultsTB
+from models.standings import CircuitWinsTB, ConstructorStandingsTB, DriverStandingsTB
+
+
+logger = logging.getLogger(__name__)
+
+TABLAS = [DriverStandingsTB.__table__, ConstructorStandingsTB.__table__, CircuitWinsTB.__table__]
+
+
+def _victorias():
+    return func.sum(case((ResultsTB.position == "1", 1), else_=0))
+
+
+def rebuild(db):
+    """
+    Recalcula las tablas de agregados desde results, sin confirmar la transacción.
+    """
+    for tabla in (DriverStandingsTB, ConstructorStandingsTB, CircuitWinsTB):
+        db.execute(delete(tabla))
+    por_carrera = (
+        select().select_from(ResultsTB)
+        .join(RacesTB, ResultsTB.raceId == RacesTB.raceId)
+        .where(ResultsTB.deletedAt.is_(None))
+    )
+    for tabla, columna in ((DriverStandingsTB, ResultsTB.driverId), (ConstructorStandingsTB, ResultsTB.constructorId)):
+        db.execute(insert(tabla).from_select(
+            ["season", columna.key, "points", "wins", "results"],
+            por_carrera.add_columns(
+                RacesTB.year, columna, func.coalesce(func.sum(ResultsTB.points), 0), _victorias(), func.count()
+            ).group_by(RacesTB.year, columna),
+        ))
+    db.execute(insert(CircuitWinsTB).from_select(
+        ["circuitId", "driverId", "wins"],
+        por_carrera.add_columns(RacesTB.circuitId, ResultsTB.driverId, func.count())
+        .where(ResultsTB.position == "1")
+        .group_by(RacesTB.circuitId, ResultsTB.driverId),
+    ))
+
+
+def ensure_populated(bind):
+    """
+    Recalcula los agregados si sus tablas están vacías y results no, por ejemplo
+    la primera vez que arranca la API sobre una base de datos ya cargada.
+    """
+    with bind.begin() as conn:
+        vacias = not conn.scalar(select(exists().select_from(DriverStandingsTB)))
+        if vacias and conn.scalar(select(exists().select_from(ResultsTB))):
+            rebuild(conn)
+            logger.info("Tablas de agregados recalculadas desde results")
+
+
+def _upsert(db, tabla, claves, filas):
+    """
+    INSERT ... ON CONFLICT DO UPDATE que suma los valores a la fila existente.
+    """
+    # Import diferido: el dialecto de Postgres no se carga si la API usa SQLite
+    from sqlalchemy.dialects import postgresql, sqlite
+    dialecto = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialecto.insert(tabla)
+    sumas = {
+        columna: getattr(tabla, columna) + stmt.excluded[columna]
+        for columna in filas[0] if columna not in claves
+    }
+    db.execute(stmt.on_conflict_do_update(index_elements=claves, set_=sumas), filas)
+
+
+def _borrar_vacias(db, tabla, claves, columna, afectadas):
+    """
+    Elimina las filas afectadas que se han quedado sin resultados tras un borrado.
+    """
+    db.execute(
+        delete(tabla)
+        .where(tuple_(*[getattr(tabla, clave) for clave in claves]).in_(afectadas))
+        .where(getattr(tabla, columna) <= 0)
+    )
+
+
+def aplicar_resultados(db, nuevos, signo=1, anteriores=()):
+    """
+    Suma (signo=1) o resta (signo=-1) a los agregados la aportación de los
+    resultados, que pueden ser modelos Result o filas ResultsTB. Con anteriores
+    (resultados sustituidos por un upsert) resta además la aportación de estos
+    en las mismas sentencias.
+    Hace una consulta para las carreras y un upsert por tabla, sea cual sea el
+    número de resultados.
+    """
+    if not nuevos and not anteriores:
+        return
+    grupos = ((signo, nuevos), (-1, anteriores))
+    carreras = {
+        carrera.raceId: carrera
+        for carrera in db.execute(
+            select(RacesTB.raceId, RacesTB.year, RacesTB.circuitId)
+            .where(RacesTB.raceId.in_({result.raceId for _, grupo in grupos for result in grupo}))
+        )
+    }
+    pilotos = defaultdict(lambda: [0.0, 0, 0])
+    constructores = defaultdict(lambda: [0.0, 0, 0])
+    circuitos = defaultdict(int)
+    for factor, grupo in grupos:
+        for result in grupo:
+            carrera = carreras.get(result.raceId)
+            if carrera is None:
+                continue
+            victoria = factor if str(result.position) == "1" else 0
+            for acumulado in (pilotos[(carrera.year, result.driverId)], constructores[(carrera.year, result.constructorId)]):
+                acumulado[0] += factor * float(result.points or 0)
+                acumulado[1] += victoria
+                acumulado[2] += factor
+            if victoria:
+                circuitos[(carrera.circuitId, result.driverId)] += victoria
+    resta = signo < 0 or bool(anteriores)
+
+    for tabla, columna, acumulados in (
+        (DriverStandingsTB, "driverId", pilotos),
+        (ConstructorStandingsTB, "constructorId", constructores),
+    ):
+        if acumulados:
+            _upsert(db, tabla, ["season", columna], [
+                {"season": season, columna: id_, "points": points, "wins": wins, "results": total}
+                for (season, id_), (points, wins, total) in acumulados.items()
+            ])
+            if resta:
+                _borrar_vacias(db, tabla, ["season", columna], "results", list(acumulados))
+    if circuitos:
+        _upsert(db, CircuitWinsTB, ["circuitId", "driverId"], [
+            {"circuitId": circuit_id, "driverId": driver_id, "wins": wins}
+            for (circuit_id, driver_id), wins in circuitos.items()
+        ])
+        if resta:
+            _borrar_vacias(db, CircuitWinsTB, ["circuitId", "driverId"], "wins", list(circuitos))
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    with engine.begin() as conn:
+        rebuild(conn)
+    logger.info("Tablas de agregados recalculadas desde results")
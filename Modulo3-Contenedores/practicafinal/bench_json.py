@@ -0,0 +1,106 @@
+"""
+Compara la serialización JSON estándar (jsonable_encoder + json) con orjson.
+
+1. Serialización: mide cuánto cuesta serializar las respuestas reales de los
+   endpoints con listas más grandes con cada serializador.
+2. Peticiones por segundo: arranca la API con uvicorn una vez por cada valor de
+   JSON_RESPONSE y lanza peticiones concurrentes contra esos endpoints.
+
+Usa la base de datos de DATABASE_URL.
+
+Uso:
+    python bench_json.py [--duracion SEGUNDOS] [--concurrencia N] [--port PUERTO]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+
+from benchmark import servidor
+
+
+ENDPOINTS = [
+    "/results?limit=1000",
+    "/standings/drivers/2017",
+    "/last_n_winners_in_circuit/1/50",
+]
+
+
+def bench_serializacion(cliente, repeticiones=200):
+    """
+    Tiempo medio en milisegundos de serializar cada respuesta con cada serializador.
+    """
+    import orjson
+
+    filas = []
+    for endpoint in ENDPOINTS:
+        contenido = cliente.get(endpoint).json()
+        tiempos = {}
+        for nombre, serializar in (
+            ("json", lambda c: json.dumps(jsonable_encoder(c), ensure_ascii=False, separators=(",", ":")).encode()),
+            ("orjson", lambda c: orjson.dumps(c, option=orjson.OPT_NON_STR_KEYS)),
+        ):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                serializar(contenido)
+            tiempos[nombre] = (time.perf_counter() - inicio) / repeticiones * 1000
+        filas.append((endpoint, tiempos["json"], tiempos["orjson"]))
+    return filas
+
+
+async def _carga(base_url, endpoint, duracion, concurrencia):
+    peticiones, errores = 0, 0
+    limite = time.perf_counter() + duracion
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as cliente:
+        async def trabajador():
+            nonlocal peticiones, errores
+            while time.perf_counter() < limite:
+                respuesta = await cliente.get(endpoint)
+                peticiones += 1
+                errores += respuesta.status_code >= 400
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    return peticiones / (time.perf_counter() - inicio), errores
+
+
+def bench_peticiones(base_url, args):
+    """
+    Devuelve {endpoint: req/s} contra la API arrancada en base_url.
+    """
+    resultados = {}
+    for endpoint in ENDPOINTS:
+        asyncio.run(_carga(base_url, endpoint, 1, args.concurrencia))  # calentamiento
+        rps, errores = asyncio.run(_carga(base_url, endpoint, args.duracion, args.concurrencia))
+        if errores:
+            print(f"  {endpoint}: {errores} respuestas con error")
+        resultados[endpoint] = rps
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la serialización JSON de la API")
+    parser.add_argument("--duracion", type=float, default=5, help="segundos de carga por endpoint")
+    parser.add_argument("--concurrencia", type=int, default=8, help="peticiones simultáneas")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    rps = {}
+    for modo in ("json", "orjson"):
+        with servidor(args.port, {"JSON_RESPONSE": modo, "CACHE_ENABLED": "false"}) as base_url:
+            if modo == "json":
+                with httpx.Client(base_url=base_url) as cliente:
+                    serializacion = bench_serializacion(cliente)
+            rps[modo] = bench_peticiones(base_url, args)
+
+    print(f"{'endpoint':36} {'json ms':>9} {'orjson ms':>10} {'json req/s':>11} {'orjson req/s':>13} {'mejora':>7}")
+    for endpoint, t_json, t_orjson in serializacion:
+        antes, despues = rps["json"][endpoint], rps["orjson"][endpoint]
+        print(f"{endpoint:36} {t_json:9.3f} {t_orjson:10.3f} {antes:11.1f} {despues:13.1f} {despues / antes:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+Caché de respuestas para los endpoints de lectura.
+
+Cada endpoint cacheado se registra con su TTL, su tamaño máximo (LRU) y las
+tablas de las que dependen sus datos. Las respuestas se guardan ya
+serializadas junto con su ETag: un acierto no consulta la base de datos ni
+vuelve a serializar, y una petición con If-None-Match que coincide recibe un
+304 sin cuerpo. Los endpoints de escritura llaman a invalidar(tabla) después
+de confirmar la transacción.
+
+El almacenamiento es intercambiable. Por defecto cada endpoint usa un
+MemoryBackend propio del proceso. Con CACHE_REDIS_URL las respuestas se guardan
+en Redis y las comparten todos los workers y contenedores. En ese caso la
+invalidación incrementa una versión en Redis, de modo que la ven todos. En
+ambos casos un fallo de caché se coalesce: si llegan muchas peticiones a la
+vez para la misma clave, solo una consulta la base de datos y el resto espera
+su respuesta.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from responses import dumps, json_response
+
+
+logger = logging.getLogger(__name__)
+
+# --- Configuración de la caché ---
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Número máximo de respuestas guardadas por endpoint
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "256"))
+# Caché compartida: redis://host:6379/0, o fakeredis:// para un Redis en memoria
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+# Segundos que una petición espera a que otra genere la misma respuesta
+CACHE_COALESCE_TIMEOUT = float(os.getenv("CACHE_COALESCE_TIMEOUT", "5"))
+CACHE_COALESCE_POLL = 0.02
+
+
+class MemoryBackend:
+    """
+    Almacén LRU en memoria con caducidad por entrada, propio de cada proceso.
+    """
+
+    bloqueante = False
+
+    def __init__(self, nombre, maxsize=CACHE_MAXSIZE):
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self._datos = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        """
+        Devuelve (valor o None, versión actual).
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None, self._version
+            valor, expira = entrada
+            if time.monotonic() >= expira:
+                del self._datos[clave]
+                return None, self._version
+            self._datos.move_to_end(clave)
+            return valor, self._version
+
+    def set(self, clave, valor, ttl, version):
+        """
+        Guarda el valor si no se ha invalidado desde que se leyó la versión.
+        """
+        with self._lock:
+            if version != self._version:
+                return
+            self._datos[clave] = (valor, time.monotonic() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._datos.clear()
+
+    # Dentro de un proceso basta con la coalescencia de ResponseCache
+    def bloquear(self, clave, ttl):
+        return True
+
+    def desbloquear(self, clave):
+        pass
+
+    def bloqueado(self, clave):
+        return False
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class RedisBackend:
+    """
+    Almacén compartido en Redis. Cada entrada guarda la versión del endpoint
+    con la que se generó; invalidar incrementa la versión, así que las entradas
+    antiguas dejan de servirse en todos los workers sin tener que buscarlas.
+    El límite de tamaño lo aplica Redis (maxmemory-policy volatile-lru: solo se
+    desalojan las entradas, que tienen TTL, y nunca las versiones).
+    Si Redis no responde, la caché se comporta como un fallo y se consulta la
+    base de datos.
+    """
+
+    bloqueante = True
+
+    def __init__(self, nombre, maxsize=CACHE_MAXSIZE, cliente=None):
+        import redis
+
+        self.nombre = nombre
+        self.maxsize = maxsize
+        self.cliente = cliente if cliente is not None else redis_client()
+        self.errores = (redis.RedisError,)
+        self._prefijo = f"f1cache:{nombre}:"
+
+    def _version_key(self):
+        return self._prefijo + "version"
+
+    def get(self, clave):
+        try:
+            version, valor = self.cliente.mget(self._version_key(), self._prefijo + clave)
+        except self.errores as e:
+            logger.warning(f"Caché Redis no disponible: {e}")
+            return None, None
+        version = int(version or 0)
+        if valor is None:
+            return None, version
+        version_entrada, etag, body = valor.split(b"\n", 2)
+        if int(version_entrada) != version:
+            return None, version
+        return (body, etag.decode()), version
+
+    def set(self, clave, valor, ttl, version):
+        if version is None:
+            return
+        body, etag = valor
+        try:
+            self.cliente.set(self._prefijo + clave, f"{version}\n{etag}\n".encode() + body, ex=max(1, int(ttl)))
+        except self.errores as e:
+            logger.warning(f"No se ha podido guardar en la caché Redis: {e}")
+
+    def clear(self):
+        try:
+            self.cliente.incr(self._version_key())
+        except self.errores as e:
+            logger.error(f"No se ha podido invalidar la caché Redis de {self.nombre}: {e}")
+
+    def bloquear(self, clave, ttl):
+        """
+        Intenta ser el único worker que genera la respuesta de la clave.
+        """
+        try:
+            return bool(self.cliente.set(self._prefijo + clave + ":lock", uuid.uuid4().hex, nx=True, px=int(ttl * 1000)))
+        except self.errores:
+            return True
+
+    def desbloquear(self, clave):
+        # El bloqueo caduca solo; si ya lo tiene otro worker, como mucho se hace una consulta de más
+        try:
+            self.cliente.delete(self._prefijo + clave + ":lock")
+        except self.errores:
+            pass
+
+    def bloqueado(self, clave):
+        try:
+            return bool(self.cliente.exists(self._prefijo + clave + ":lock"))
+        except self.errores:
+            return False
+
+    def __len__(self):
+        try:
+            return sum(1 for clave in self.cliente.scan_iter(match=self._prefijo + "*")
+                       if not clave.endswith((b":lock", b":version")))
+        except self.errores:
+            return 0
+
+
+_redis_client = None
+
+
+def redis_client(url=None):
+    """
+    Devuelve el cliente de Redis compartido por todos los endpoints. Se crea
+    al registrar el primer endpoint en create_app(), así que una configuración
+    incorrecta falla al arrancar y no en la primera petición.
+    """
+    global _redis_client
+    if _redis_client is None:
+        url = url or CACHE_REDIS_URL
+        if url.startswith("fakeredis://"):
+            try:
+                import fakeredis
+            except ImportError:
+                raise RuntimeError("CACHE_REDIS_URL=fakeredis:// necesita fakeredis: "
+                                   "pip install -r requirements-dev.txt") from None
+            _redis_client = fakeredis.FakeRedis()
+        else:
+            import redis
+            _redis_client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+    return _redis_client
+
+
+def default_backend():
+    """
+    Backend configurado por entorno: Redis si hay CACHE_REDIS_URL, si no memoria.
+    """
+    return RedisBackend if CACHE_REDIS_URL else MemoryBackend
+
+
+class EndpointCache:
+    """
+    Configuración, almacén y contadores de un endpoint cacheado.
+    Los contadores son de este proceso.
+    """
+
+    def __init__(self, nombre, ttl, tablas, backend):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.tablas = set(tablas)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def contar(self, contador):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "ttl": self.ttl,
+                "tablas": sorted(self.tablas),
+                "entradas": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+                "coalesced": self.coalesced,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
+
+
+class _Generacion:
+    """
+    Respuesta que está generando un hilo, para los hilos que esperan la misma clave.
+    """
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.entrada = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Registro de endpoints cacheados.
+    """
+
+    def __init__(self, backend_factory=None):
+        self.backend_factory = backend_factory or default_backend()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        # Generaciones en curso en este proceso: hilos (sync) y futuros (async)
+        self._en_curso = {}
+        self._en_curso_async = {}
+
+    def registrar(self, nombre, ttl, tablas=(), maxsize=CACHE_MAXSIZE):
+        """
+        Registra un endpoint cacheado. tablas son las tablas cuya escritura
+        invalida sus respuestas.
+        """
+        self._endpoints[nombre] = EndpointCache(nombre, ttl, tablas, self.backend_factory(nombre, maxsize))
+        return self._endpoints[nombre]
+
+    def responder(self, request: Request, nombre, producir):
+        """
+        Devuelve la respuesta cacheada del endpoint o la genera con producir(),
+        que devuelve el contenido JSON de la respuesta.
+        """
+        if not CACHE_ENABLED:
+            return json_response(producir())
+        endpoint, clave = self._endpoints[nombre], _clave(request)
+        entrada, version = endpoint.backend.get(clave)
+        if entrada is not None:
+            endpoint.contar("hits")
+            return self._respuesta(request, endpoint, entrada, "HIT")
+        endpoint.contar("misses")
+
+        with self._lock:
+            generacion = self._en_curso.get((nombre, clave))
+            propia = generacion is None
+            if propia:
+                generacion = self._en_curso[(nombre, clave)] = _Generacion()
+        if not propia:
+            # Otro hilo de este proceso ya está generando la respuesta
+            if generacion.listo.wait(CACHE_COALESCE_TIMEOUT):
+                if generacion.error is not None:
+                    raise generacion.error
+                endpoint.contar("coalesced")
+                return self._respuesta(request, endpoint, generacion.entrada, "HIT")
+            return self._respuesta(request, endpoint, self._guardar(endpoint, clave, version, producir()), "MISS")
+        try:
+            entrada, estado = self._producir(endpoint, clave, version, producir)
+            generacion.entrada = entrada
+        except Exception as e:
+            generacion.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[(nombre, clave)]
+            generacion.listo.set()
+        return self._respuesta(request, endpoint, entrada, estado)
+
+    def _producir(self, endpoint, clave, version, producir):
+        backend = endpoint.backend
+        if not backend.bloquear(clave, CACHE_COALESCE_TIMEOUT):
+            # Otro worker está generando la respuesta: se espera a que la guarde
+            limite = time.monotonic() + CACHE_COALESCE_TIMEOUT
+            while time.monotonic() < limite:
+                time.sleep(CACHE_COALESCE_POLL)
+                entrada, version = backend.get(clave)
+                if entrada is not None:
+                    endpoint.contar("coalesced")
+                    return entrada, "HIT"
+                if not backend.bloqueado(clave):
+                    break
+            return self._guardar(endpoint, clave, version, producir()), "MISS"
+        try:
+            return self._guardar(endpoint, clave, version, producir()), "MISS"
+        finally:
+            backend.desbloquear(clave)
+
+    async def responder_async(self, request: Request, nombre, producir):
+        """
+        Igual que responder(), con producir como función asíncrona.
+        """
+        if not CACHE_ENABLED:
+            return json_response(await producir())
+        endpoint, clave = self._endpoints[nombre], _clave(request)
+        entrada, version = await _llamar(endpoint.backend, "get", clave)
+        if entrada is not None:
+            endpoint.contar("hits")
+            return self._respuesta(request, endpoint, entrada, "HIT")
+        endpoint.contar("misses")
+
+        futuro = self._en_curso_async.get((nombre, clave))
+        if futuro is not None:
+            # Otra petición de este proceso ya está generando la respuesta
+            try:
+                entrada = await asyncio.wait_for(asyncio.shield(futuro), CACHE_COALESCE_TIMEOUT)
+            except asyncio.TimeoutError:
+                entrada = await self._guardar_async(endpoint, clave, version, await producir())
+                return self._respuesta(request, endpoint, entrada, "MISS")
+            endpoint.contar("coalesced")
+            return self._respuesta(request, endpoint, entrada, "HIT")
+
+        futuro = self._en_curso_async[(nombre, clave)] = asyncio.get_running_loop().create_future()
+        try:
+            entrada, estado = await self._producir_async(endpoint, clave, version, producir)
+            futuro.set_result(entrada)
+        except Exception as e:
+            futuro.set_exception(e)
+            # Evita el aviso de excepción no recuperada si nadie esperaba el futuro
+            futuro.exception()
+            raise
+        finally:
+            del self._en_curso_async[(nombre, clave)]
+        return self._respuesta(request, endpoint, entrada, estado)
+
+    async def _producir_async(self, endpoint, clave, version, producir):
+        backend = endpoint.backend
+        if not await _llamar(backend, "bloquear", clave, CACHE_COALESCE_TIMEOUT):
+            limite = time.monotonic() + CACHE_COALESCE_TIMEOUT
+            while time.monotonic() < limite:
+                await asyncio.sleep(CACHE_COALESCE_POLL)
+                entrada, version = await _llamar(backend, "get", clave)
+                if entrada is not None:
+                    endpoint.contar("coalesced")
+                    return entrada, "HIT"
+                if not await _llamar(backend, "bloqueado", clave):
+                    break
+            return await self._guardar_async(endpoint, clave, version, await producir()), "MISS"
+        try:
+            return await self._guardar_async(endpoint, clave, version, await producir()), "MISS"
+        finally:
+            await _llamar(backend, "desbloquear", clave)
+
+    def _guardar(self, endpoint, clave, version, contenido):
+        entrada = _serializar(contenido)
+        endpoint.backend.set(clave, entrada, endpoint.ttl, version)
+        return entrada
+
+    async def _guardar_async(self, endpoint, clave, version, contenido):
+        entrada = _serializar(contenido)
+        await _llamar(endpoint.backend, "set", clave, entrada, endpoint.ttl, version)
+        return entrada
+
+    def _respuesta(self, request, endpoint, entrada, estado):
+        body, etag = entrada
+        # no-cache: el cliente puede guardar la respuesta pero debe revalidarla
+        # con el ETag, porque las escrituras la invalidan antes de que caduque
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": estado}
+        if etag in _etags(request.headers.get("if-none-match", "")):
+            endpoint.contar("not_modified")
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidar(self, *tablas):
+        """
+        Vacía los endpoints que dependen de alguna de las tablas.
+        """
+        for endpoint in self._endpoints.values():
+            if endpoint.tablas.intersection(tablas):
+                endpoint.backend.clear()
+                endpoint.contar("invalidations")
+
+    def stats(self):
+        """
+        Devuelve la configuración y los contadores de cada endpoint cacheado.
+        """
+        return {nombre: endpoint.snapshot() for nombre, endpoint in self._endpoints.items()}
+
+
+async def _llamar(backend, metodo, *args):
+    # Las operaciones de red de Redis se ejecutan fuera del event loop
+    if backend.bloqueante:
+        return await asyncio.to_thread(getattr(backend, metodo), *args)
+    return getattr(backend, metodo)(*args)
+
+
+def _clave(request):
+    return f"{request.url.path}?{request.url.query}"
+
+
+def _serializar(contenido):
+    body = dumps(contenido)
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _etags(if_none_match):
+    etags = set()
+    for etag in if_none_match.split(","):
+        etag = etag.strip()
+        etags.add(etag[2:] if etag.startswith("W/") else etag)
+    return etags
+
+
+response_cache = ResponseCache()
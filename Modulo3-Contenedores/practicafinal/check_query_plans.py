@@ -0,0 +1,88 @@
+"""
+Comprueba con EXPLAIN que las consultas más frecuentes de la API usan índices.
+
+Termina con código de salida 1 si el plan de alguna consulta recorre
+secuencialmente una de las tablas grandes (results, races, drivers), lo que
+indica que falta algún índice de dbformula1_bueno/03_schema.sql. La tabla
+circuits es tan pequeña que Postgres la recorre entera aunque tenga índice.
+
+Uso:
+    python check_query_plans.py
+"""
+
+import json
+import sys
+
+import crud
+import purge
+import queries
+from database import engine, is_sqlite
+from models.results import ResultsTB
+
+
+TABLAS_GRANDES = ("results", "races", "drivers")
+
+# Consultas calientes de la API, con parámetros representativos
+CONSULTAS = {
+    "last_n_winners_in_circuit": queries.last_n_winners(circuit_id=9, n=5),
+    "delete_result (búsqueda por id)": crud.sentencia_borrado(ResultsTB.resultId == 1),
+    "delete_results_bulk (por carrera)": crud.sentencia_borrado(ResultsTB.raceId == 1),
+    "purga de resultados borrados": purge.marcados(),
+    "list_results (página profunda)": queries.list_results(after=20000, limit=100),
+    "list_results (por piloto)": queries.list_results(after=20000, limit=100, driver_id=1),
+}
+
+
+def _compile(stmt):
+    compiled = stmt.compile(dialect=engine.dialect)
+    if compiled.positiontup is not None:
+        return str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)
+    return str(compiled), compiled.params
+
+
+def seq_scans_postgres(conn, stmt):
+    """
+    Devuelve las tablas grandes que el plan de Postgres recorre con Seq Scan.
+    """
+    sql, params = _compile(stmt)
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    pendientes, encontradas = [plan[0]["Plan"]], []
+    while pendientes:
+        nodo = pendientes.pop()
+        if nodo["Node Type"] == "Seq Scan" and nodo.get("Relation Name") in TABLAS_GRANDES:
+            encontradas.append(nodo["Relation Name"])
+        pendientes.extend(nodo.get("Plans", []))
+    return encontradas
+
+
+def seq_scans_sqlite(conn, stmt):
+    """
+    Devuelve las tablas grandes que SQLite recorre enteras (SCAN en lugar de SEARCH).
+    """
+    sql, params = _compile(stmt)
+    encontradas = []
+    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params):
+        detalle = row[-1].split()
+        if detalle[0] == "SCAN" and detalle[1] in TABLAS_GRANDES:
+            encontradas.append(detalle[1])
+    return encontradas
+
+
+def main():
+    seq_scans = seq_scans_sqlite if is_sqlite(str(engine.url)) else seq_scans_postgres
+    fallos = 0
+    with engine.connect() as conn:
+        for nombre, stmt in CONSULTAS.items():
+            tablas = seq_scans(conn, stmt)
+            if tablas:
+                fallos += 1
+                print(f"FALLO {nombre}: recorrido secuencial sobre {', '.join(tablas)}")
+            else:
+                print(f"OK    {nombre}")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,117 +1,651 @@
 """
 Módulo cliente para interactuar con la API de resultados de carreras.
+
+FormulaUnoClient es el cliente síncrono y AsyncFormulaUnoClient el cliente de
+asyncio, con los mismos métodos. Los dos reutilizan las conexiones (keep-alive)
+de un pool de httpx, devuelven los datos de la respuesta en lugar de imprimirlos
+y lanzan FormulaUnoError si la API responde con un error.
+
+Las peticiones que fallan por un error de conexión o con 429, 502, 503 o 504 se
+reintentan hasta `reintentos` veces con espera exponencial. Los POST solo se
+reintentan si la petición no llegó a enviarse, para no crear resultados
+duplicados, salvo los de crear_* con upsert=True, que la API puede repetir sin
+duplicar nada (crean o actualizan el resultado de la misma carrera y piloto);
+solo estos reintentan también el 409 de una carga simultánea del mismo
+resultado. Si un borrado reintentado recibe 404 porque el intento anterior sí
+llegó a borrar el resultado, se da por hecho.
+
+Uso:
+    with FormulaUnoClient("http://localhost:8000") as client:
+        circuitos = client.obtener_circuitos()
+
+    async with AsyncFormulaUnoClient("http://localhost:8000") as client:
+        estados = await client.crear_resultados(resultados, concurrencia=8)
 """
 
-import requests
-
-class FormulaUnoClient:
-    def __init__(self):
-        self.base_url = "http://127.0.0.1:8000/"
-
-    def crear_resultado(self):
-        """
-        Realiza una petición POST para crear un nuevo resultado de carrera.
-        """
-        url = self.base_url + "results/"
-        pilotos_data = {
-            "raceId": 10,
-            "driverId": 24,
-            "constructorId": 23,
-            "number": 4,
-            "grid": 5,
-            "position": 2,
-            "positionText": "1",
-            "positionOrder": 1,
-            "points": 25,
-            "laps": 56,
-            "time": "1:34:05.715",
-            "milliseconds": 5645715,
-            "fastestLap": 44,
-            "rank": 1,
-            "fastestLapTime": "1:32.406",
-            "fastestLapSpeed": "210,5",
-            "statusId": 1
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, BinaryIO, Iterator, Optional, TypedDict, Union
+
+import httpx
+
+
+# URL de la API por defecto
+FORMULA1_API_URL = os.getenv("FORMULA1_API_URL", "http://127.0.0.1:8000")
+
+# Códigos de estado que se reintentan en GET, DELETE y POST con upsert
+REINTENTABLES = {429, 502, 503, 504}
+# En POST con upsert también 409: otra petición está cargando a la vez el mismo resultado
+REINTENTABLES_UPSERT = REINTENTABLES | {409}
+# Respuestas tras las que la petición pudo ejecutarse aunque se haya perdido la respuesta
+PERDIDAS = {502, 504}
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "DELETE"}
+# Errores en los que la petición no ha llegado al servidor: se reintentan en cualquier método
+NO_ENVIADA = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Espera máxima entre reintentos, en segundos
+BACKOFF_MAX = 10.0
+
+
+# --- Tipos de las respuestas ---
+
+class Resultado(TypedDict, total=False):
+    resultId: int
+    raceId: int
+    driverId: int
+    constructorId: int
+    number: Optional[int]
+    grid: Optional[int]
+    position: Optional[Union[int, str]]
+    positionText: Optional[str]
+    positionOrder: Optional[int]
+    points: Optional[float]
+    laps: Optional[int]
+    time: Optional[str]
+    milliseconds: Optional[int]
+    fastestLap: Optional[int]
+    rank: Optional[int]
+    fastestLapTime: Optional[str]
+    fastestLapSpeed: Optional[str]
+    statusId: int
+
+
+class Circuito(TypedDict):
+    id_circuito: int
+    nombre_circuito: str
+
+
+class Ganador(TypedDict):
+    name: str
+    surname: str
+    race: str
+    circuit: str
+    time: Optional[str]
+    date: Optional[str]
+
+
+class VictoriasPiloto(TypedDict):
+    position: int
+    driverId: int
+    name: str
+    surname: str
+    wins: int
+
+
+class ClasificacionPiloto(TypedDict):
+    position: int
+    driverId: int
+    name: str
+    surname: str
+    points: float
+    wins: int
+
+
+class ClasificacionConstructor(TypedDict):
+    position: int
+    constructorId: int
+    points: float
+    wins: int
+
+
+class PaginaResultados(TypedDict):
+    results: list[Resultado]
+    next_cursor: Optional[str]
+
+
+class EstadoLote(TypedDict, total=False):
+    index: int
+    status: str  # "created" o "invalid"; con upsert también "updated" o "unchanged"
+    resultId: int
+    errors: list[dict[str, Any]]
+
+
+class FormulaUnoError(Exception):
+    """
+    Error devuelto por la API (status_code) o de conexión (status_code None).
+    """
+
+    def __init__(self, status_code, detail):
+        super().__init__(f"{status_code}: {detail}" if status_code else str(detail))
+        self.status_code = status_code
+        self.detail = detail
+
+
+# --- Lógica común ---
+
+def _lotes(items, tamano):
+    return [items[inicio:inicio + tamano] for inicio in range(0, len(items), tamano)]
+
+
+def _filtros_resultados(season, race_id, driver_id, constructor_id, position, limit, cursor):
+    params = {"season": season, "raceId": race_id, "driverId": driver_id,
+              "constructorId": constructor_id, "position": position, "limit": limit, "cursor": cursor}
+    return {clave: valor for clave, valor in params.items() if valor is not None}
+
+
+def _upsert(upsert):
+    """
+    Argumentos de _request de un POST de resultados, con o sin upsert.
+    """
+    return {"params": {"upsert": "true"}, "idempotente": True, "reintentables": REINTENTABLES_UPSERT} if upsert else {}
+
+
+def _borrado(result_ids, race_id):
+    return {"resultIds": result_ids} if race_id is None else {"raceId": race_id}
+
+
+def _estados_lote(respuestas, tamano_lote):
+    """
+    Une los estados de cada lote con el índice de cada resultado en la lista completa.
+    """
+    estados = []
+    for numero, datos in enumerate(respuestas):
+        for estado in datos["items"]:
+            estados.append({**estado, "index": numero * tamano_lote + estado["index"]})
+    return estados
+
+
+class _BaseClient:
+    def __init__(self, base_url=None, timeout=10.0, reintentos=3, backoff=0.2, max_conexiones=20):
+        """
+        Args:
+            base_url (str): URL de la API (FORMULA1_API_URL por defecto).
+            timeout (float): segundos máximos de conexión y de espera de respuesta.
+            reintentos (int): reintentos como máximo de cada petición.
+            backoff (float): espera antes del primer reintento; se duplica en cada uno.
+            max_conexiones (int): conexiones abiertas como máximo con la API.
+        """
+        self.base_url = (base_url or FORMULA1_API_URL).rstrip("/")
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self._opciones = {
+            "base_url": self.base_url,
+            "timeout": timeout,
+            "limits": httpx.Limits(max_connections=max_conexiones, max_keepalive_connections=max_conexiones),
         }
-        response = requests.post(url, json=pilotos_data)
-        print(f"Código de respuesta: {response.status_code}")
-        if response.headers.get("content-type") == "application/json":
-            print(f"Respuesta: {response.json()}")
-        else:
-            print("Respuesta en formato no JSON")
 
-    def eliminar_resultado(self, result_id):
+    def _espera(self, idempotente, intento, respuesta=None, error=None, reintentables=REINTENTABLES):
         """
-        Realiza una petición DELETE para eliminar un resultado de carrera por su ID.
+        Segundos a esperar antes de reintentar o None si no hay que reintentar.
         """
-        url = self.base_url + f"results/{result_id}"
-        response = requests.delete(url)
-        print(f"Código de respuesta: {response.status_code}")
-        if response.headers.get("content-type") == "application/json":
-            print(f"Respuesta: {response.json()}")
-        else:
-            print("Respuesta en formato no JSON")
+        if intento >= self.reintentos:
+            return None
+        if error is not None:
+            if not idempotente and not isinstance(error, NO_ENVIADA):
+                return None
+        elif respuesta.status_code not in reintentables or not idempotente:
+            return None
+        retry_after = respuesta.headers.get("Retry-After", "") if respuesta is not None else ""
+        if retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+        return min(self.backoff * 2 ** intento, BACKOFF_MAX) * random.uniform(0.5, 1.0)
 
-    def obtener_inventario(self):
+    @staticmethod
+    def _quizas_ejecutada(respuesta=None, error=None):
         """
-        Realiza una petición GET para obtener el inventario de tablas y columnas.
+        Indica si un intento fallido pudo ejecutarse en el servidor: la conexión
+        se cortó después de enviar la petición o un proxy perdió la respuesta.
         """
-        url = self.base_url + "inventario/"
-        response = requests.get(url)
-        print(f"Código de respuesta: {response.status_code}")
-        if response.headers.get("content-type") == "application/json":
-            print(f"Respuesta: {response.json()}")
-        else:
-            print("Respuesta en formato no JSON")
+        if error is not None:
+            return not isinstance(error, NO_ENVIADA)
+        return respuesta.status_code in PERDIDAS
+
+    @staticmethod
+    def _comprobar(respuesta):
+        if respuesta.status_code >= 400:
+            try:
+                detail = respuesta.json().get("detail")
+            except ValueError:
+                detail = respuesta.text
+            raise FormulaUnoError(respuesta.status_code, detail)
+        return respuesta
+
+
+# --- Cliente síncrono ---
+
+class FormulaUnoClient(_BaseClient):
+    """
+    Cliente síncrono. Se puede usar desde varios hilos a la vez.
+    """
+
+    def __init__(self, base_url=None, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self._http = httpx.Client(**self._opciones)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._http.close()
 
-    def obtener_circuitos(self):
+    def _request(self, metodo, ruta, idempotente=False, reintentables=REINTENTABLES, si_no_existe=None,
+                 **kwargs) -> Any:
+        idempotente = idempotente or metodo in METODOS_IDEMPOTENTES
+        intento, ejecutada = 0, False
+        while True:
+            try:
+                respuesta = self._http.request(metodo, ruta, **kwargs)
+            except httpx.TransportError as e:
+                espera = self._espera(idempotente, intento, error=e)
+                if espera is None:
+                    raise FormulaUnoError(None, repr(e)) from e
+                ejecutada = ejecutada or self._quizas_ejecutada(error=e)
+            else:
+                if si_no_existe is not None and ejecutada and respuesta.status_code == 404:
+                    # Lo ha borrado un intento anterior cuya respuesta se perdió
+                    return si_no_existe
+                espera = self._espera(idempotente, intento, respuesta=respuesta, reintentables=reintentables)
+                if espera is None:
+                    return self._comprobar(respuesta).json()
+                ejecutada = ejecutada or self._quizas_ejecutada(respuesta=respuesta)
+            time.sleep(espera)
+            intento += 1
+
+    def obtener_inventario(self) -> dict[str, list[str]]:
         """
-        Realiza una petición GET para obtener los identificadores y nombres de los circuitos.
+        Devuelve las tablas de la base de datos y sus columnas.
         """
-        url = self.base_url + "circuit_ids"
-        response = requests.get(url)
-        print(f"Código de respuesta: {response.status_code}")
-        if response.headers.get("content-type") == "application/json":
-            print(f"Respuesta: {response.json()}")
-        else:
-            print("Respuesta en formato no JSON")
+        return self._request("GET", "/inventario/")["tablas"]
 
-    def obtener_ultimos_ganadores(self, circuit_id, n):
+    def obtener_circuitos(self) -> list[Circuito]:
         """
-        Realiza una petición GET para obtener los últimos n ganadores en un circuito específico.
-        Args:
-            circuit_id (int): ID del circuito.
-            n (int): Número de ganadores a consultar.
-        """
-        url = self.base_url + f"last_n_winners_in_circuit/{circuit_id}/{n}"
-        response = requests.get(url)
-        print(f"Código de respuesta: {response.status_code}")
-        if response.headers.get("content-type") == "application/json":
-            data = response.json()
-            print(f"Respuesta: {data}")
-            # Comprobar si aparece 'Fernando Alonso' en los ganadores
-            found = False
-            winners = data.get("winners", [])
-            for winner in winners:
-                nombre_completo = f"{winner.get('name', '')} {winner.get('surname', '')}".strip().lower()
-                if "fernando alonso" in nombre_completo:
-                    found = True
-                    break
-            if found:
-                print("Fernando Alonso aparece en los resultados.")
+        Devuelve los identificadores y nombres de los circuitos.
+        """
+        return self._request("GET", "/circuit_ids")["circuit_ids"]
+
+    def obtener_ultimos_ganadores(self, circuit_id: int, n: int) -> list[Ganador]:
+        """
+        Devuelve los últimos n ganadores en un circuito.
+        """
+        return self._request("GET", f"/last_n_winners_in_circuit/{circuit_id}/{n}")["winners"]
+
+    def obtener_mas_victorias(self, circuit_id: int, n: int) -> list[VictoriasPiloto]:
+        """
+        Devuelve los n pilotos con más victorias en un circuito.
+        """
+        return self._request("GET", f"/most_wins_in_circuit/{circuit_id}/{n}")["winners"]
+
+    def obtener_clasificacion_pilotos(self, season: int) -> list[ClasificacionPiloto]:
+        """
+        Devuelve la clasificación de pilotos de una temporada.
+        """
+        return self._request("GET", f"/standings/drivers/{season}")["standings"]
+
+    def obtener_clasificacion_constructores(self, season: int) -> list[ClasificacionConstructor]:
+        """
+        Devuelve la clasificación de constructores de una temporada.
+        """
+        return self._request("GET", f"/standings/constructors/{season}")["standings"]
+
+    def listar_resultados(self, season=None, race_id=None, driver_id=None, constructor_id=None,
+                          position=None, limit=100, cursor=None) -> PaginaResultados:
+        """
+        Devuelve una página de resultados y el cursor de la siguiente (None en la última).
+        """
+        params = _filtros_resultados(season, race_id, driver_id, constructor_id, position, limit, cursor)
+        datos = self._request("GET", "/results", params=params)
+        return {"results": datos["results"], "next_cursor": datos["next_cursor"]}
+
+    def iterar_resultados(self, season=None, race_id=None, driver_id=None, constructor_id=None,
+                          position=None, limit=1000) -> Iterator[Resultado]:
+        """
+        Recorre todos los resultados que cumplen los filtros, pidiendo las páginas de una en una.
+        """
+        cursor = None
+        while True:
+            pagina = self.listar_resultados(season, race_id, driver_id, constructor_id, position, limit, cursor)
+            yield from pagina["results"]
+            cursor = pagina["next_cursor"]
+            if cursor is None:
+                return
+
+    def crear_resultado(self, resultado: Resultado, upsert=False) -> Resultado:
+        """
+        Crea un resultado y lo devuelve con su resultId. Con upsert=True
+        actualiza el de la misma carrera y piloto si ya existe.
+        """
+        return self._request("POST", "/results/", json=resultado, **_upsert(upsert))
+
+    def crear_lote(self, resultados: list[Resultado], upsert=False) -> list[EstadoLote]:
+        """
+        Crea un lote de resultados con una sola petición a /results/bulk.
+        """
+        return self._request("POST", "/results/bulk", json=resultados, **_upsert(upsert))["items"]
+
+    def crear_resultados(self, resultados: list[Resultado], tamano_lote=500, concurrencia=4,
+                         upsert=False) -> list[EstadoLote]:
+        """
+        Crea muchos resultados en lotes de tamano_lote, con como máximo
+        concurrencia lotes en curso a la vez. Devuelve el estado de cada
+        resultado en el mismo orden que la lista. Con upsert=True la carga se
+        puede repetir entera si falla a medias.
+        """
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            respuestas = list(pool.map(
+                lambda lote: self._request("POST", "/results/bulk", json=lote, **_upsert(upsert)),
+                _lotes(resultados, tamano_lote),
+            ))
+        return _estados_lote(respuestas, tamano_lote)
+
+    def eliminar_resultado(self, result_id: int) -> None:
+        """
+        Elimina un resultado por su identificador.
+        """
+        self._request("DELETE", f"/results/{result_id}", si_no_existe={})
+
+    def eliminar_lote(self, result_ids: Optional[list[int]] = None, race_id: Optional[int] = None) -> list[int]:
+        """
+        Elimina con una sola petición a /results/bulk los resultados de la
+        lista o todos los de una carrera. Devuelve los resultId eliminados; si
+        la petición se ha reintentado, faltan los que borró un intento anterior
+        cuya respuesta se perdió (la API ignora los que ya no existen).
+        """
+        return self._request("DELETE", "/results/bulk", json=_borrado(result_ids, race_id))["resultIds"]
+
+    def eliminar_resultados(self, result_ids: list[int], concurrencia=8) -> list[Optional[FormulaUnoError]]:
+        """
+        Elimina varios resultados con como máximo concurrencia peticiones en curso.
+        Devuelve, en el mismo orden, None o el error de cada borrado.
+        """
+        def eliminar(result_id):
+            try:
+                self.eliminar_resultado(result_id)
+            except FormulaUnoError as e:
+                return e
+            return None
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            return list(pool.map(eliminar, result_ids))
+
+    def exportar(self, tabla: str, destino: BinaryIO, formato="ndjson", columns=None, season=None) -> int:
+        """
+        Escribe en destino la exportación de una tabla a medida que llega.
+        Devuelve los bytes escritos.
+        """
+        params = {"format": formato, "columns": columns, "season": season}
+        params = {clave: valor for clave, valor in params.items() if valor is not None}
+        escritos = 0
+        with self._http.stream("GET", f"/export/{tabla}", params=params) as respuesta:
+            if respuesta.status_code >= 400:
+                respuesta.read()
+            self._comprobar(respuesta)
+            for bloque in respuesta.iter_bytes():
+                escritos += destino.write(bloque)
+        return escritos
+
+    def obtener_estado_cache(self) -> dict[str, dict[str, Any]]:
+        """
+        Devuelve los contadores de la caché de respuestas por endpoint.
+        """
+        return self._request("GET", "/cache/stats")["endpoints"]
+
+    def obtener_estado_pool(self) -> dict[str, dict[str, Any]]:
+        """
+        Devuelve el estado y las métricas de los pools de conexiones.
+        """
+        return self._request("GET", "/db/pool")["pools"]
+
+
+# --- Cliente asíncrono ---
+
+class AsyncFormulaUnoClient(_BaseClient):
+    """
+    Cliente de asyncio, para lanzar muchas peticiones a la vez desde un event loop.
+    """
+
+    def __init__(self, base_url=None, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self._http = httpx.AsyncClient(**self._opciones)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def _request(self, metodo, ruta, idempotente=False, reintentables=REINTENTABLES, si_no_existe=None,
+                       **kwargs) -> Any:
+        idempotente = idempotente or metodo in METODOS_IDEMPOTENTES
+        intento, ejecutada = 0, False
+        while True:
+            try:
+                respuesta = await self._http.request(metodo, ruta, **kwargs)
+            except httpx.TransportError as e:
+                espera = self._espera(idempotente, intento, error=e)
+                if espera is None:
+                    raise FormulaUnoError(None, repr(e)) from e
+                ejecutada = ejecutada or self._quizas_ejecutada(error=e)
             else:
-                print("Fernando Alonso NO aparece en los resultados.")
-        else:
-            print("Respuesta en formato no JSON")
+                if si_no_existe is not None and ejecutada and respuesta.status_code == 404:
+                    # Lo ha borrado un intento anterior cuya respuesta se perdió
+                    return si_no_existe
+                espera = self._espera(idempotente, intento, respuesta=respuesta, reintentables=reintentables)
+                if espera is None:
+                    return self._comprobar(respuesta).json()
+                ejecutada = ejecutada or self._quizas_ejecutada(respuesta=respuesta)
+            await asyncio.sleep(espera)
+            intento += 1
+
+    async def _limitadas(self, corrutinas, concurrencia):
+        """
+        Ejecuta las corrutinas con como máximo concurrencia en curso y devuelve
+        sus resultados en orden.
+        """
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def limitada(corrutina):
+            async with semaforo:
+                return await corrutina
+
+        return await asyncio.gather(*(limitada(corrutina) for corrutina in corrutinas))
+
+    async def obtener_inventario(self) -> dict[str, list[str]]:
+        """
+        Devuelve las tablas de la base de datos y sus columnas.
+        """
+        return (await self._request("GET", "/inventario/"))["tablas"]
+
+    async def obtener_circuitos(self) -> list[Circuito]:
+        """
+        Devuelve los identificadores y nombres de los circuitos.
+        """
+        return (await self._request("GET", "/circuit_ids"))["circuit_ids"]
+
+    async def obtener_ultimos_ganadores(self, circuit_id: int, n: int) -> list[Ganador]:
+        """
+        Devuelve los últimos n ganadores en un circuito.
+        """
+        return (await self._request("GET", f"/last_n_winners_in_circuit/{circuit_id}/{n}"))["winners"]
+
+    async def obtener_mas_victorias(self, circuit_id: int, n: int) -> list[VictoriasPiloto]:
+        """
+        Devuelve los n pilotos con más victorias en un circuito.
+        """
+        return (await self._request("GET", f"/most_wins_in_circuit/{circuit_id}/{n}"))["winners"]
+
+    async def obtener_clasificacion_pilotos(self, season: int) -> list[ClasificacionPiloto]:
+        """
+        Devuelve la clasificación de pilotos de una temporada.
+        """
+        return (await self._request("GET", f"/standings/drivers/{season}"))["standings"]
+
+    async def obtener_clasificacion_constructores(self, season: int) -> list[ClasificacionConstructor]:
+        """
+        Devuelve la clasificación de constructores de una temporada.
+        """
+        return (await self._request("GET", f"/standings/constructors/{season}"))["standings"]
+
+    async def listar_resultados(self, season=None, race_id=None, driver_id=None, constructor_id=None,
+                                position=None, limit=100, cursor=None) -> PaginaResultados:
+        """
+        Devuelve una página de resultados y el cursor de la siguiente (None en la última).
+        """
+        params = _filtros_resultados(season, race_id, driver_id, constructor_id, position, limit, cursor)
+        datos = await self._request("GET", "/results", params=params)
+        return {"results": datos["results"], "next_cursor": datos["next_cursor"]}
+
+    async def iterar_resultados(self, season=None, race_id=None, driver_id=None, constructor_id=None,
+                                position=None, limit=1000) -> AsyncIterator[Resultado]:
+        """
+        Recorre todos los resultados que cumplen los filtros, pidiendo las páginas de una en una.
+        """
+        cursor = None
+        while True:
+            pagina = await self.listar_resultados(season, race_id, driver_id, constructor_id, position, limit, cursor)
+            for resultado in pagina["results"]:
+                yield resultado
+            cursor = pagina["next_cursor"]
+            if cursor is None:
+                return
+
+    async def crear_resultado(self, resultado: Resultado, upsert=False) -> Resultado:
+        """
+        Crea un resultado y lo devuelve con su resultId. Con upsert=True
+        actualiza el de la misma carrera y piloto si ya existe.
+        """
+        return await self._request("POST", "/results/", json=resultado, **_upsert(upsert))
+
+    async def crear_lote(self, resultados: list[Resultado], upsert=False) -> list[EstadoLote]:
+        """
+        Crea un lote de resultados con una sola petición a /results/bulk.
+        """
+        return (await self._request("POST", "/results/bulk", json=resultados, **_upsert(upsert)))["items"]
+
+    async def crear_resultados(self, resultados: list[Resultado], tamano_lote=500, concurrencia=4,
+                               upsert=False) -> list[EstadoLote]:
+        """
+        Crea muchos resultados en lotes de tamano_lote, con como máximo
+        concurrencia lotes en curso a la vez. Devuelve el estado de cada
+        resultado en el mismo orden que la lista. Con upsert=True la carga se
+        puede repetir entera si falla a medias.
+        """
+        respuestas = await self._limitadas(
+            [self._request("POST", "/results/bulk", json=lote, **_upsert(upsert)) for lote in _lotes(resultados, tamano_lote)],
+            concurrencia,
+        )
+        return _estados_lote(respuestas, tamano_lote)
+
+    async def eliminar_resultado(self, result_id: int) -> None:
+        """
+        Elimina un resultado por su identificador.
+        """
+        await self._request("DELETE", f"/results/{result_id}", si_no_existe={})
+
+    async def eliminar_lote(self, result_ids: Optional[list[int]] = None, race_id: Optional[int] = None) -> list[int]:
+        """
+        Elimina con una sola petición a /results/bulk los resultados de la
+        lista o todos los de una carrera. Devuelve los resultId eliminados; si
+        la petición se ha reintentado, faltan los que borró un intento anterior
+        cuya respuesta se perdió (la API ignora los que ya no existen).
+        """
+        return (await self._request("DELETE", "/results/bulk", json=_borrado(result_ids, race_id)))["resultIds"]
+
+    async def eliminar_resultados(self, result_ids: list[int], concurrencia=8) -> list[Optional[FormulaUnoError]]:
+        """
+        Elimina varios resultados con como máximo concurrencia peticiones en curso.
+        Devuelve, en el mismo orden, None o el error de cada borrado.
+        """
+        async def eliminar(result_id):
+            try:
+                await self.eliminar_resultado(result_id)
+            except FormulaUnoError as e:
+                return e
+            return None
+
+        return await self._limitadas([eliminar(result_id) for result_id in result_ids], concurrencia)
+
+    async def exportar(self, tabla: str, destino: BinaryIO, formato="ndjson", columns=None, season=None) -> int:
+        """
+        Escribe en destino la exportación de una tabla a medida que llega.
+        Devuelve los bytes escritos.
+        """
+        params = {"format": formato, "columns": columns, "season": season}
+        params = {clave: valor for clave, valor in params.items() if valor is not None}
+        escritos = 0
+        async with self._http.stream("GET", f"/export/{tabla}", params=params) as respuesta:
+            if respuesta.status_code >= 400:
+                await respuesta.aread()
+            self._comprobar(respuesta)
+            async for bloque in respuesta.aiter_bytes():
+                escritos += destino.write(bloque)
+        return escritos
+
+    async def obtener_estado_cache(self) -> dict[str, dict[str, Any]]:
+        """
+        Devuelve los contadores de la caché de respuestas por endpoint.
+        """
+        return (await self._request("GET", "/cache/stats"))["endpoints"]
+
+    async def obtener_estado_pool(self) -> dict[str, dict[str, Any]]:
+        """
+        Devuelve el estado y las métricas de los pools de conexiones.
+        """
+        return (await self._request("GET", "/db/pool"))["pools"]
+
 
 if __name__ == "__main__":
-    client = FormulaUnoClient()
-    print("== Crear resultado ==")
-    client.crear_resultado()
-    print("\n== Eliminar resultado (ID 23783) ==")
-    client.eliminar_resultado(23787)
-    print("\n== Obtener inventario ==")
-    client.obtener_inventario()
-    print("\n== Obtener circuitos ==")
-    client.obtener_circuitos()
-    print("\n== Obtener últimos ganadores (circuito 1, n=3) ==")
-    client.obtener_ultimos_ganadores(1, 3)
\ No newline at end of file
+    resultado = {
+        "raceId": 10,
+        "driverId": 24,
+        "constructorId": 23,
+        "number": 4,
+        "grid": 5,
+        "position": 2,
+        "positionText": "1",
+        "positionOrder": 1,
+        "points": 25,
+        "laps": 56,
+        "time": "1:34:05.715",
+        "milliseconds": 5645715,
+        "fastestLap": 44,
+        "rank": 1,
+        "fastestLapTime": "1:32.406",
+        "fastestLapSpeed": "210,5",
+        "statusId": 1
+    }
+    with FormulaUnoClient() as client:
+        print("== Crear resultado ==")
+        creado = client.crear_resultado(resultado)
+        print(f"Respuesta: {creado}")
+        print(f"\n== Eliminar resultado (ID {creado['resultId']}) ==")
+        client.eliminar_resultado(creado["resultId"])
+        print("\n== Obtener inventario ==")
+        print(f"Respuesta: {client.obtener_inventario()}")
+        print("\n== Obtener circuitos ==")
+        print(f"Respuesta: {client.obtener_circuitos()}")
+        print("\n== Obtener últimos ganadores (circuito 1, n=3) ==")
+        winners = client.obtener_ultimos_ganadores(1, 3)
+        print(f"Respuesta: {winners}")
+        # Comprobar si aparece 'Fernando Alonso' en los ganadores
+        if any(f"{w['name']} {w['surname']}".lower() == "fernando alonso" for w in winners):
+            print("Fernando Alonso aparece en los resultados.")
+        else:
+            print("Fernando Alonso NO aparece en los resultados.")
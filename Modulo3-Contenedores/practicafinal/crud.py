@@ -0,0 +1,568 @@
+"""
+Operaciones de escritura sobre la tabla results.
+
+Las funciones reciben una Session síncrona. Los endpoints del modo async las
+reutilizan con AsyncSession.run_sync, que las ejecuta sin salir del event loop.
+Cada endpoint de escritura es una llamada a escribir() con su operación
+(crear_resultado, crear_lote, eliminar_lote o eliminar_resultado), que valida,
+escribe y construye la respuesta igual en los dos modos.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import (
+    Integer, String, and_, cast, delete, event, func, insert, literal, literal_column, null, or_, select, tuple_,
+    union_all, update,
+)
+from sqlalchemy.orm import Session
+
+import aggregates
+from cache import response_cache
+from models import results
+from models.drivers import DriversTB
+from models.races import RacesTB
+from responses import json_response
+
+
+logger = logging.getLogger(__name__)
+
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Si está activo, solo se aceptan resultados de carreras de la última temporada
+RESULTS_SOLO_ULTIMA_TEMPORADA = os.getenv("RESULTS_SOLO_ULTIMA_TEMPORADA", "false").lower() in ("1", "true", "yes")
+
+# Si está activo, los borrados solo marcan los resultados y purge.py los borra después
+RESULTS_SOFT_DELETE = os.getenv("RESULTS_SOFT_DELETE", "false").lower() in ("1", "true", "yes")
+
+# Longitud máxima de la cabecera Idempotency-Key
+IDEMPOTENCY_KEY_MAX = 200
+
+# Columna que debe contener cada identificador referenciado por un resultado.
+# La base de datos no tiene tablas de constructores ni de estados: se aceptan
+# los identificadores que ya aparecen en results.
+REFERENCIAS = {
+    "raceId": RacesTB.raceId,
+    "driverId": DriversTB.driverId,
+    "constructorId": results.ResultsTB.constructorId,
+    "statusId": results.ResultsTB.statusId,
+}
+
+
+async def leer_lote_resultados(request: Request):
+    """
+    Dependencia que lee el cuerpo de una petición de carga masiva, ya sea un
+    array JSON o un flujo NDJSON (un objeto JSON por línea), y devuelve la
+    lista de elementos sin validar. En NDJSON una línea mal formada se marca
+    como inválida en lugar de rechazar todo el lote.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    if content_type in NDJSON_TYPES:
+        items, pendiente = [], b""
+        async for chunk in request.stream():
+            lineas = (pendiente + chunk).split(b"\n")
+            pendiente = lineas.pop()
+            items.extend(_linea_ndjson(linea) for linea in lineas if linea.strip())
+        if pendiente.strip():
+            items.append(_linea_ndjson(pendiente))
+        return items
+    if content_type != "application/json":
+        raise HTTPException(status_code=415, detail=f"Content-Type no soportado: {content_type}")
+    try:
+        items = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"JSON mal formado: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un array JSON de resultados")
+    return items
+
+
+def _linea_ndjson(linea):
+    try:
+        return json.loads(linea)
+    except ValueError as e:
+        return ValueError(f"JSON mal formado: {e}")
+
+
+def validar_lote(items):
+    """
+    Valida todos los elementos del lote en una pasada.
+    Devuelve (validos, estados): validos es una lista de (posición, Result) y
+    estados el estado de cada elemento, en el mismo orden que la petición.
+    """
+    validos, estados = [], []
+    for index, item in enumerate(items):
+        if isinstance(item, ValueError):
+            estados.append({"index": index, "status": "invalid", "errors": [{"loc": [], "msg": str(item)}]})
+            continue
+        try:
+            validos.append((index, results.Result.model_validate(item)))
+            estados.append({"index": index, "status": "pending"})
+        except ValidationError as e:
+            errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            estados.append({"index": index, "status": "invalid", "errors": errors})
+    return validos, estados
+
+
+class UltimaTemporada:
+    """
+    Año de la última temporada, guardado en memoria. Se invalida al insertar
+    carreras desde este proceso y caduca pasados ttl segundos para recoger las
+    que inserten otros procesos.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._year = None
+        self._expira = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db):
+        with self._lock:
+            if self._year is not None and time.monotonic() < self._expira:
+                return self._year
+        year = db.scalar(select(func.max(RacesTB.year)))
+        with self._lock:
+            self._year, self._expira = year, time.monotonic() + self.ttl
+        return year
+
+    def invalidar(self, *args):
+        with self._lock:
+            self._year = None
+
+
+ultima_temporada = UltimaTemporada()
+
+event.listen(RacesTB, "after_insert", ultima_temporada.invalidar)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidar_temporada(orm_execute_state):
+    # INSERT masivos (insert(RacesTB)) que no pasan por after_insert
+    if orm_execute_state.is_insert and orm_execute_state.bind_mapper is RacesTB.__mapper__:
+        ultima_temporada.invalidar()
+
+
+def _referencias_existentes(db, nuevos):
+    """
+    Busca con una sola consulta (UNION ALL de una búsqueda por índice por cada
+    referencia) qué identificadores del lote existen.
+    Devuelve {campo: {id: año de la carrera o None}}.
+    """
+    partes = []
+    for campo, columna in REFERENCIAS.items():
+        year = RacesTB.year if campo == "raceId" else cast(null(), Integer)
+        ids = {getattr(result, campo) for result in nuevos}
+        partes.append(
+            select(literal(campo, String).label("campo"), columna.label("id"), year.label("year"))
+            .where(columna.in_(ids))
+            .distinct()
+        )
+    existentes = {campo: {} for campo in REFERENCIAS}
+    for campo, id_, year in db.execute(union_all(*partes)):
+        existentes[campo][id_] = year
+    return existentes
+
+
+def comprobar_referencias(db, nuevos):
+    """
+    Comprueba que existen la carrera, el piloto, el constructor y el estado de
+    cada resultado y, con RESULTS_SOLO_ULTIMA_TEMPORADA, que la carrera es de
+    la última temporada.
+    Devuelve una lista de errores por resultado (vacía si es válido).
+    """
+    if not nuevos:
+        return []
+    existentes = _referencias_existentes(db, nuevos)
+    temporada = ultima_temporada.get(db) if RESULTS_SOLO_ULTIMA_TEMPORADA else None
+    errores = []
+    for result in nuevos:
+        errors = [
+            {"loc": [campo], "msg": f"{campo} {getattr(result, campo)} no existe"}
+            for campo in REFERENCIAS
+            if getattr(result, campo) not in existentes[campo]
+        ]
+        year = existentes["raceId"].get(result.raceId)
+        if temporada is not None and year is not None and year < temporada:
+            errors.append({"loc": ["raceId"], "msg": f"La carrera es de {year}, anterior a la última temporada ({temporada})"})
+        errores.append(errors)
+    return errores
+
+
+def validar_referencias(db, validos, estados):
+    """
+    Comprueba las referencias de todo el lote y marca como inválidos en estados
+    los elementos que no las cumplen. Devuelve los elementos que siguen siendo válidos.
+    """
+    errores = comprobar_referencias(db, [result for _, result in validos])
+    aceptados = []
+    for (index, result), errors in zip(validos, errores):
+        if errors:
+            estados[index] = {"index": index, "status": "invalid", "errors": errors}
+        else:
+            aceptados.append((index, result))
+    return aceptados
+
+
+def insert_results(db, nuevos):
+    """
+    Inserta los resultados con un único INSERT multifila (RETURNING resultId)
+    dentro de la transacción de la sesión, sin confirmarla.
+    Devuelve los identificadores en el mismo orden que los resultados recibidos.
+    En Postgres es una sola sentencia por cada 1000 filas; SQLite no garantiza el
+    orden de RETURNING en un INSERT multifila, así que SQLAlchemy inserta fila a
+    fila (siempre dentro de la misma transacción).
+    """
+    if not nuevos:
+        return []
+    filas = [result.model_dump(exclude={"resultId"}) for result in nuevos]
+    stmt = insert(results.ResultsTB).returning(results.ResultsTB.resultId, sort_by_parameter_order=True)
+    return list(db.scalars(stmt, filas))
+
+
+def completar_estados(estados, validos, ids, status=None):
+    """
+    Marca como creados los elementos insertados, con su nuevo resultId, o con
+    el estado de status (created, updated o unchanged) si se han cargado con upsert.
+    """
+    for posicion, ((index, _), result_id) in enumerate(zip(validos, ids)):
+        estados[index] = {"index": index, "status": status[posicion] if status else "created", "resultId": result_id}
+    return estados
+
+
+# --- Cargas idempotentes (upsert) ---
+
+class ClaveEnUso(Exception):
+    """
+    Otra transacción ha creado a la vez un resultado con la misma clave de
+    idempotencia: se deshace la carga y el cliente la puede repetir.
+    """
+
+
+def clave_natural(result):
+    return f"race:{result.raceId}:driver:{result.driverId}"
+
+
+def clave_natural_sql():
+    """
+    clave_natural() como expresión SQL, para asignarla a los resultados existentes.
+    """
+    return "race:" + cast(results.ResultsTB.raceId, String) + ":driver:" + cast(results.ResultsTB.driverId, String)
+
+
+def clave_idempotencia(result, idempotency_key, index=None):
+    """
+    Clave con la que se carga un resultado: la de la cabecera Idempotency-Key
+    (con la posición del elemento en un lote) o, sin cabecera, la clave natural
+    (raceId, driverId).
+    """
+    if idempotency_key is None:
+        return clave_natural(result)
+    return f"key:{idempotency_key}" if index is None else f"key:{idempotency_key}:{index}"
+
+
+def claves_lote(validos, estados, idempotency_key):
+    """
+    Claves de los elementos válidos de un lote. Si dos elementos tienen la
+    misma clave natural se carga el último y los anteriores se marcan como
+    inválidos. Devuelve (validos, claves).
+    """
+    ultimo = {}
+    for index, result in validos:
+        ultimo[clave_idempotencia(result, idempotency_key, index)] = index
+    aceptados, claves = [], []
+    for index, result in validos:
+        clave = clave_idempotencia(result, idempotency_key, index)
+        if ultimo[clave] != index:
+            estados[index] = {"index": index, "status": "invalid", "errors": [
+                {"loc": [], "msg": f"Resultado repetido en el lote: se carga el elemento {ultimo[clave]}"}
+            ]}
+        else:
+            aceptados.append((index, result))
+            claves.append(clave)
+    return aceptados, claves
+
+
+def adoptar_sin_clave(db, nuevos):
+    """
+    Asigna la clave natural a los resultados de la misma carrera y piloto que
+    se crearon sin clave (con POST sin upsert), para que el upsert los
+    encuentre y los actualice en lugar de crear otro. Solo se asigna si el
+    resultado sin clave es el único de su carrera y piloto. Lee (y en Postgres
+    bloquea con FOR UPDATE) las filas de esos pares, dentro de la transacción
+    de la sesión, sin confirmarla.
+    Devuelve las claves de los pares con más de un resultado (coches
+    compartidos), que un upsert no puede corregir sin saber cuál es.
+    """
+    tabla = results.ResultsTB.__table__
+    claves = {clave_natural(result): (result.raceId, result.driverId) for result in nuevos}
+    filas = db.execute(
+        select(tabla.c.resultId, tabla.c.raceId, tabla.c.driverId, tabla.c.idempotencyKey)
+        .where(
+            tuple_(tabla.c.raceId, tabla.c.driverId).in_(set(claves.values())),
+            or_(and_(tabla.c.idempotencyKey.is_(None), tabla.c.deletedAt.is_(None)), tabla.c.idempotencyKey.in_(list(claves))),
+        )
+        .with_for_update()
+    ).all()
+    por_par = {}
+    for fila in filas:
+        por_par.setdefault((fila.raceId, fila.driverId), []).append(fila)
+    adoptadas, ambiguas = [], set()
+    for (race_id, driver_id), filas_par in por_par.items():
+        if all(fila.idempotencyKey is not None for fila in filas_par):
+            continue
+        if len(filas_par) == 1:
+            adoptadas.append(filas_par[0].resultId)
+        else:
+            ambiguas.add(f"race:{race_id}:driver:{driver_id}")
+    if adoptadas:
+        db.execute(
+            update(tabla).where(tabla.c.resultId.in_(adoptadas)).values(idempotencyKey=clave_natural_sql())
+        )
+    return ambiguas
+
+
+def sin_ambiguos(db, validos, claves, estados):
+    """
+    Llama a adoptar_sin_clave con los elementos de un lote y marca como
+    inválidos los que no se pueden corregir con upsert. Devuelve (validos, claves).
+    """
+    ambiguas = adoptar_sin_clave(db, [result for _, result in validos])
+    aceptados = []
+    for (index, result), clave in zip(validos, claves):
+        if clave in ambiguas:
+            estados[index] = {"index": index, "status": "invalid", "errors": [{"loc": [], "msg": ambiguo(result)}]}
+        else:
+            aceptados.append(((index, result), clave))
+    return [item for item, _ in aceptados], [clave for _, clave in aceptados]
+
+
+def ambiguo(result):
+    return (f"Hay varios resultados de la carrera {result.raceId} y el piloto {result.driverId}: "
+            "no se puede saber cuál corregir con upsert")
+
+
+def _cargar(db, nuevos, claves):
+    """
+    Ejecuta INSERT ... ON CONFLICT ("idempotencyKey") DO UPDATE ... RETURNING con
+    los resultados y sus claves. La fila que ya tiene la clave se reescribe si
+    está borrada con RESULTS_SOFT_DELETE o si algún valor cambia.
+    Devuelve (clave, resultId, insertada) de las filas escritas.
+    """
+    # Import diferido: el dialecto de Postgres no se carga si la API usa SQLite
+    from sqlalchemy.dialects import postgresql, sqlite
+    tabla = results.ResultsTB.__table__
+    postgres = db.get_bind().dialect.name == "postgresql"
+    filas = [{**result.model_dump(exclude={"resultId"}), "idempotencyKey": clave} for result, clave in zip(nuevos, claves)]
+    columnas = [columna for columna in filas[0] if columna != "idempotencyKey"]
+    stmt = (postgresql if postgres else sqlite).insert(tabla)
+    cambios = [tabla.c[columna].is_distinct_from(stmt.excluded[columna]) for columna in columnas]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[tabla.c.idempotencyKey],
+        set_={**{columna: stmt.excluded[columna] for columna in columnas}, "deletedAt": None},
+        where=or_(tabla.c.deletedAt.is_not(None), *cambios),
+    )
+    # xmax = 0 distingue en Postgres una fila insertada de una actualizada. En
+    # SQLite las escrituras no son concurrentes: si la clave no existía, se ha insertado
+    insertada = literal_column("xmax = 0") if postgres else literal(True)
+    return db.execute(stmt.returning(tabla.c.idempotencyKey, tabla.c.resultId, insertada), filas).all()
+
+
+def upsert_results(db, nuevos, claves):
+    """
+    Crea o actualiza los resultados según su clave con un único
+    INSERT ... ON CONFLICT ("idempotencyKey") DO UPDATE ... RETURNING, dentro de
+    la transacción de la sesión, sin confirmarla. Las filas que ya tienen los
+    mismos valores no se reescriben, así que repetir una carga no escribe nada.
+
+    Antes lee (y en Postgres bloquea con FOR UPDATE) las filas con esas claves
+    para restar su aportación a los agregados, que se ajustan aquí. Una fila
+    borrada con RESULTS_SOFT_DELETE y aún sin purgar se recupera como creada. Lanza
+    ClaveEnUso si otra transacción ha creado a la vez una de las claves.
+    Devuelve (estados, ids) en el orden recibido, con estado created, updated o unchanged.
+    """
+    if not nuevos:
+        return [], []
+    tabla = results.ResultsTB.__table__
+    existentes = {
+        fila.idempotencyKey: fila
+        for fila in db.execute(select(tabla).where(tabla.c.idempotencyKey.in_(claves)).with_for_update())
+    }
+    escritas = {clave: (result_id, nueva) for clave, result_id, nueva in _cargar(db, nuevos, claves)}
+
+    estados, ids, cambiados, sustituidos = [], [], [], []
+    for result, clave in zip(nuevos, claves):
+        anterior = existentes.get(clave)
+        if anterior is None:
+            result_id, nueva = escritas.get(clave, (None, False))
+            if not nueva:
+                raise ClaveEnUso(f"Otra petición está cargando a la vez el resultado con clave {clave}")
+            estados.append("created")
+            cambiados.append(result)
+        elif anterior.deletedAt is not None:
+            # Su aportación a los agregados ya se restó al borrarla
+            result_id = anterior.resultId
+            estados.append("created")
+            cambiados.append(result)
+        elif clave in escritas:
+            result_id = anterior.resultId
+            estados.append("updated")
+            cambiados.append(result)
+            sustituidos.append(anterior)
+        else:
+            result_id = anterior.resultId
+            estados.append("unchanged")
+        ids.append(result_id)
+    aggregates.aplicar_resultados(db, cambiados, anteriores=sustituidos)
+    return estados, ids
+
+
+# --- Borrados ---
+
+def sentencia_borrado(condicion):
+    """
+    DELETE (o, con RESULTS_SOFT_DELETE, UPDATE ... SET "deletedAt") de los
+    resultados que cumplen la condición y no están ya borrados, con RETURNING
+    de las columnas que necesitan los agregados.
+    """
+    tabla = results.ResultsTB.__table__
+    if RESULTS_SOFT_DELETE:
+        stmt = update(tabla).values(deletedAt=func.current_timestamp())
+    else:
+        stmt = delete(tabla)
+    return stmt.where(condicion, tabla.c.deletedAt.is_(None)).returning(
+        tabla.c.resultId, tabla.c.raceId, tabla.c.driverId, tabla.c.constructorId, tabla.c.points, tabla.c.position,
+    )
+
+
+def delete_results(db, condicion):
+    """
+    Borra con una sola sentencia los resultados que cumplen la condición y resta
+    su aportación a los agregados, dentro de la transacción de la sesión, sin
+    confirmarla. Con RESULTS_SOFT_DELETE solo los marca: desaparecen de las
+    consultas de la API al momento y purge.py los borra después en lotes.
+    Devuelve los resultId borrados.
+    """
+    filas = db.execute(sentencia_borrado(condicion)).all()
+    aggregates.aplicar_resultados(db, filas, -1)
+    return [fila.resultId for fila in filas]
+
+
+def condicion_borrado(peticion):
+    """
+    Condición de DELETE /results/bulk: por lista de resultId o por carrera.
+    """
+    if peticion.raceId is not None:
+        return results.ResultsTB.raceId == peticion.raceId
+    return results.ResultsTB.resultId.in_(peticion.resultIds)
+
+
+# --- Operaciones de los endpoints de escritura ---
+
+def escribir(db, operacion, *args):
+    """
+    Ejecuta operacion(db, *args) y confirma la transacción. La operación
+    devuelve (respuesta, cambios); si ha cambiado algo se vacían las respuestas
+    cacheadas que dependen de results. Cualquier error deshace la transacción:
+    las HTTPException de la operación se propagan, ClaveEnUso devuelve 409 y
+    el resto de errores 500.
+    """
+    try:
+        respuesta, cambios = operacion(db, *args)
+        db.commit()
+    except HTTPException:
+        db.rollback()
+        raise
+    except ClaveEnUso as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error al escribir en results: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if cambios:
+        response_cache.invalidar("results")
+    return respuesta
+
+
+def crear_resultado(db, result, upsert=False, idempotency_key=None):
+    """
+    POST /results/: lanza 400 si la carrera, el piloto, el constructor o el
+    estado no existen. Con upsert o Idempotency-Key crea o actualiza el
+    resultado (ver upsert_results) e indica el estado en la cabecera
+    Idempotency-Status. La respuesta se construye con el resultado ya validado
+    y el resultId asignado, sin volver a leer la fila.
+    """
+    errores = comprobar_referencias(db, [result])[0]
+    if errores:
+        raise HTTPException(status_code=400, detail=errores)
+    if upsert or idempotency_key is not None:
+        if idempotency_key is None and adoptar_sin_clave(db, [result]):
+            raise HTTPException(status_code=409, detail=ambiguo(result))
+        estados, ids = upsert_results(db, [result], [clave_idempotencia(result, idempotency_key)])
+        respuesta = json_response({**result.model_dump(), "resultId": ids[0]}, headers={"Idempotency-Status": estados[0]})
+        return respuesta, estados[0] != "unchanged"
+    ids = insert_results(db, [result])
+    aggregates.aplicar_resultados(db, [result])
+    return json_response({**result.model_dump(), "resultId": ids[0]}), True
+
+
+def crear_lote(db, items, upsert=False, idempotency_key=None):
+    """
+    POST /results/bulk: valida el lote, inserta los elementos válidos (o, con
+    upsert o Idempotency-Key, los carga con un único upsert) y devuelve el
+    estado de cada elemento.
+    """
+    validos, estados = validar_lote(items)
+    validos = validar_referencias(db, validos, estados)
+    if upsert or idempotency_key is not None:
+        validos, claves = claves_lote(validos, estados, idempotency_key)
+        if idempotency_key is None and validos:
+            validos, claves = sin_ambiguos(db, validos, claves, estados)
+        cargados, ids = upsert_results(db, [result for _, result in validos], claves)
+        cuenta = {status: cargados.count(status) for status in ("created", "updated", "unchanged")}
+        logger.info(f"Lote de resultados: {cuenta}, {len(estados) - len(ids)} inválidos")
+        respuesta = json_response({
+            "msg": f"{cuenta['created']} resultados creados, {cuenta['updated']} actualizados y "
+                   f"{cuenta['unchanged']} sin cambios de {len(estados)}",
+            "items": completar_estados(estados, validos, ids, cargados)
+        })
+        return respuesta, bool(cuenta["created"] or cuenta["updated"])
+    ids = insert_results(db, [result for _, result in validos])
+    aggregates.aplicar_resultados(db, [result for _, result in validos])
+    logger.info(f"Lote de resultados: {len(ids)} creados, {len(estados) - len(ids)} inválidos")
+    respuesta = json_response({
+        "msg": f"{len(ids)} resultados creados de {len(estados)}",
+        "items": completar_estados(estados, validos, ids)
+    })
+    return respuesta, bool(ids)
+
+
+def eliminar_lote(db, peticion):
+    """
+    DELETE /results/bulk: elimina los resultados de una lista de resultId o
+    todos los de una carrera. Los que no existen se ignoran.
+    """
+    ids = delete_results(db, condicion_borrado(peticion))
+    logger.info(f"Lote de borrado: {len(ids)} resultados eliminados")
+    respuesta = json_response({
+        "msg": f"{len(ids)} resultados eliminados",
+        "resultIds": ids
+    })
+    return respuesta, bool(ids)
+
+
+def eliminar_resultado(db, result_id):
+    """
+    DELETE /results/{id}: lanza 404 si el resultado no existe.
+    """
+    logger.info(f"Intentando eliminar resultado con ID: {result_id}")
+    if not delete_results(db, results.ResultsTB.resultId == result_id):
+        raise HTTPException(status_code=404, detail="Resultado no encontrado")
+    return json_response({"msg": f"Resultado con ID {result_id} eliminado correctamente"}), True
@@ -0,0 +1,107 @@
+--
+-- PostgreSQL database dump
+--
+
+-- Dumped from database version 17.5 (Debian 17.5-1.pgdg120+1)
+-- Dumped by pg_dump version 17.5 (Debian 17.5-1.pgdg120+1)
+
+SET statement_timeout = 0;
+SET lock_timeout = 0;
+SET idle_in_transaction_session_timeout = 0;
+SET client_encoding = 'UTF8';
+SET standard_conforming_strings = on;
+SELECT pg_catalog.set_config('search_path', '', false);
+SET client_min_messages = warning;
+SET default_tablespace = '';
+SET default_table_access_method = heap;
+
+--
+-- Name: circuits; Type: TABLE; Schema: public; Owner: test
+--
+
+CREATE TABLE public.circuits (
+    "circuitId" bigint,
+    "circuitRef" text,
+    name text,
+    location text,
+    country text,
+    lat double precision,
+    lng double precision,
+    alt text,
+    url text
+);
+
+
+ALTER TABLE public.circuits OWNER TO test;
+
+--
+-- Name: drivers; Type: TABLE; Schema: public; Owner: test
+--
+
+CREATE TABLE public.drivers (
+    "driverId" bigint,
+    "driverRef" text,
+    number text,
+    code text,
+    forename text,
+    surname text,
+    dob text,
+    nationality text,
+    url text
+);
+
+
+ALTER TABLE public.drivers OWNER TO test;
+
+--
+-- Name: races; Type: TABLE; Schema: public; Owner: test
+--
+
+CREATE TABLE public.races (
+    "raceId" bigint,
+    year bigint,
+    round bigint,
+    "circuitId" bigint,
+    name text,
+    date text,
+    "time" text,
+    url text
+);
+
+
+ALTER TABLE public.races OWNER TO test;
+
+--
+-- Name: results; Type: TABLE; Schema: public; Owner: test
+--
+
+CREATE TABLE public.results (
+    "resultId" bigint,
+    "raceId" bigint,
+    "driverId" bigint,
+    "constructorId" bigint,
+    number text,
+    grid bigint,
+    "position" text,
+    "positionText" text,
+    "positionOrder" bigint,
+    points double precision,
+    laps bigint,
+    "time" text,
+    milliseconds text,
+    "fastestLap" text,
+    rank text,
+    "fastestLapTime" text,
+    "fastestLapSpeed" text,
+    "statusId" bigint
+);
+
+
+ALTER TABLE public.results OWNER TO test;
+
+
+--
+-- Los datos se cargan con COPY en 02_data.sql y las claves e índices se crean
+-- después de la carga en 03_schema.sql.
+--
+
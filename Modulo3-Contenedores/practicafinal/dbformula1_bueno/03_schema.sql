@@ -0,0 +1,100 @@
+--
+-- Claves primarias, claves foráneas e índices del esquema de Fórmula 1.
+--
+-- 01_tables.sql crea las tablas sin restricciones ni índices, y
+-- create_all de SQLAlchemy no modifica tablas que ya existen, así que las
+-- declaraciones primary_key/index de models/*.py nunca llegan a Postgres.
+-- Este script se ejecuta después de la carga de datos de 02_data.sql
+-- (docker-entrypoint-initdb.d los ejecuta en orden alfabético) y también con
+-- `python migrate.py` sobre una base de datos ya existente. Todas las
+-- sentencias son idempotentes.
+--
+
+SET client_min_messages = warning;
+
+--
+-- Claves primarias e identidad (autoincremento) de los identificadores
+--
+
+DO $$
+DECLARE
+    pk record;
+BEGIN
+    FOR pk IN
+        SELECT * FROM (VALUES
+            ('circuits', 'circuitId'),
+            ('drivers', 'driverId'),
+            ('races', 'raceId'),
+            ('results', 'resultId')
+        ) AS t(tabla, columna)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conrelid = format('public.%I', pk.tabla)::regclass AND contype = 'p'
+        ) THEN
+            EXECUTE format('ALTER TABLE public.%I ADD CONSTRAINT %I PRIMARY KEY (%I)',
+                           pk.tabla, pk.tabla || '_pkey', pk.columna);
+        END IF;
+
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid = format('public.%I', pk.tabla)::regclass
+              AND attname = pk.columna AND attidentity <> ''
+        ) THEN
+            EXECUTE format('ALTER TABLE public.%I ALTER COLUMN %I ADD GENERATED BY DEFAULT AS IDENTITY',
+                           pk.tabla, pk.columna);
+        END IF;
+
+        -- La identidad debe continuar después del mayor identificador cargado
+        EXECUTE format('SELECT setval(pg_get_serial_sequence(%L, %L), COALESCE(MAX(%I), 0) + 1, false) FROM public.%I',
+                       'public.' || pk.tabla, pk.columna, pk.columna, pk.tabla);
+    END LOOP;
+END $$;
+
+--
+-- Claves foráneas
+--
+
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    FOR fk IN
+        SELECT * FROM (VALUES
+            ('races', 'circuitId', 'circuits', 'races_circuitId_fkey'),
+            ('results', 'raceId', 'races', 'results_raceId_fkey'),
+            ('results', 'driverId', 'drivers', 'results_driverId_fkey')
+        ) AS t(tabla, columna, referencia, nombre)
+    LOOP
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = fk.nombre) THEN
+            EXECUTE format('ALTER TABLE public.%I ADD CONSTRAINT %I FOREIGN KEY (%I) REFERENCES public.%I (%I)',
+                           fk.tabla, fk.nombre, fk.columna, fk.referencia, fk.columna);
+        END IF;
+    END LOOP;
+END $$;
+
+--
+-- Índices ajustados a las consultas de la API
+--
+
+-- /last_n_winners_in_circuit: carreras de un circuito ordenadas por fecha descendente
+CREATE INDEX IF NOT EXISTS "ix_races_circuit_date" ON public.races ("circuitId", date DESC);
+
+-- /last_n_winners_in_circuit: ganador (position = '1') de cada carrera
+CREATE INDEX IF NOT EXISTS "ix_results_race_position" ON public.results ("raceId", "position");
+
+-- Búsquedas por piloto y lado referenciante de la clave foránea
+CREATE INDEX IF NOT EXISTS "ix_results_driverId" ON public.results ("driverId");
+
+-- POST /results/: comprobación de constructorId y statusId existentes
+CREATE INDEX IF NOT EXISTS "ix_results_constructorId" ON public.results ("constructorId");
+CREATE INDEX IF NOT EXISTS "ix_results_statusId" ON public.results ("statusId");
+
+-- Referencias únicas declaradas en los modelos
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_circuits_circuitRef" ON public.circuits ("circuitRef");
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_drivers_driverRef" ON public.drivers ("driverRef");
+
+ANALYZE public.circuits;
+ANALYZE public.drivers;
+ANALYZE public.races;
+ANALYZE public.results;
@@ -0,0 +1,401 @@
+"""
+Exportación de tablas completas en streaming.
+
+Las filas se leen con un cursor de servidor (yield_per activa stream_results)
+en bloques de EXPORT_YIELD_PER filas y cada bloque se serializa y se envía en
+cuanto llega, de modo que la memoria del servidor no depende del tamaño de la
+tabla y el primer byte sale tras leer el primer bloque.
+
+Formatos:
+    ndjson, csv: texto, una fila por línea.
+    arrow: flujo Arrow IPC, un RecordBatch por bloque leído.
+    parquet: fichero Parquet con grupos de filas de EXPORT_PARQUET_ROW_GROUP filas.
+Para Arrow y Parquet los tipos de cada columna se toman de la tabla real de
+la base de datos (reflexión), no de los modelos, que declaran como enteros
+algunas columnas que en la base de datos son texto.
+
+La sesión se abre dentro del generador y no con Depends(get_db): FastAPI
+cierra las dependencias antes de empezar a enviar el cuerpo de un
+StreamingResponse. El generador lee el primer bloque y lo serializa antes de
+devolver nada (ver respuesta()): así un error al leer la tabla o al convertir
+sus tipos se responde con 500, en lugar de cortar una descarga que ya ha
+empezado con 200.
+"""
+
+import csv
+import importlib.util
+import io
+import itertools
+import json
+import logging
+import os
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import MetaData, Table, select
+from sqlalchemy import types as sqltypes
+
+import database
+from models.basemodel import Base
+from models import results, circuit, races
+
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque leído del cursor y enviado al cliente
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "1000"))
+# Filas por grupo de filas de Parquet: más filas comprimen mejor pero ocupan más memoria
+EXPORT_PARQUET_ROW_GROUP = int(os.getenv("EXPORT_PARQUET_ROW_GROUP", "65536"))
+
+TABLAS_EXPORTABLES = ("results", "races", "drivers", "circuits")
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+FORMATOS_ARROW = ("arrow", "parquet")
+
+
+def tabla_exportable(nombre):
+    """
+    Devuelve la tabla a exportar o None si no se puede exportar.
+    """
+    if nombre not in TABLAS_EXPORTABLES:
+        return None
+    return Base.metadata.tables[nombre]
+
+
+def formato_disponible(formato):
+    """
+    Indica si el formato se puede servir: Arrow y Parquet necesitan pyarrow.
+    """
+    return formato not in FORMATOS_ARROW or importlib.util.find_spec("pyarrow") is not None
+
+
+def columnas_exportadas(tabla, columns=None):
+    """
+    Devuelve la lista de columnas a exportar a partir de "col1,col2" (todas si
+    no se indica ninguna). Lanza ValueError si alguna columna no existe.
+    """
+    todas = [columna.name for columna in tabla.columns]
+    if not columns:
+        return todas
+    pedidas = [nombre.strip() for nombre in columns.split(",") if nombre.strip()]
+    desconocidas = [nombre for nombre in pedidas if nombre not in todas]
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas en {tabla.name}: {', '.join(desconocidas)}")
+    return pedidas
+
+
+def _filtro_temporada(tabla, season):
+    """
+    Condición que limita la tabla a una temporada: las carreras de ese año y
+    los resultados, pilotos y circuitos de esas carreras.
+    """
+    races = Base.metadata.tables["races"]
+    results = Base.metadata.tables["results"]
+    carreras = select(races.c.raceId).where(races.c.year == season)
+    if tabla.name == "races":
+        return tabla.c.year == season
+    if tabla.name == "results":
+        return tabla.c.raceId.in_(carreras)
+    if tabla.name == "drivers":
+        return tabla.c.driverId.in_(select(results.c.driverId).where(results.c.raceId.in_(carreras)))
+    return tabla.c.circuitId.in_(select(races.c.circuitId).where(races.c.year == season))
+
+
+def _select(tabla, columnas, season=None):
+    clave = [tabla.c[columna.name] for columna in Base.metadata.tables[tabla.name].primary_key.columns]
+    stmt = select(*[tabla.c[nombre] for nombre in columnas]).order_by(*clave)
+    if season is not None:
+        stmt = stmt.where(_filtro_temporada(tabla, season))
+    if tabla.name == "results":
+        # Resultados borrados con RESULTS_SOFT_DELETE pendientes de purgar
+        stmt = stmt.where(tabla.c.deletedAt.is_(None))
+    return stmt.execution_options(yield_per=EXPORT_YIELD_PER)
+
+
+_reflejadas = {}
+
+
+def _reflejar(conn, nombre):
+    """
+    Tabla con los tipos reales de la base de datos, reflejada una vez por dialecto.
+    """
+    clave = (conn.dialect.name, nombre)
+    if clave not in _reflejadas:
+        _reflejadas[clave] = Table(nombre, MetaData(), autoload_with=conn)
+    return _reflejadas[clave]
+
+
+# --- Serialización por formato ---
+
+class _NdjsonWriter:
+    def __init__(self, tabla, columnas):
+        self.columnas = columnas
+
+    def inicio(self):
+        return b""
+
+    def escribir(self, filas):
+        buffer = io.StringIO()
+        for fila in filas:
+            buffer.write(json.dumps(dict(zip(self.columnas, fila)), default=str, ensure_ascii=False))
+            buffer.write("\n")
+        return buffer.getvalue().encode("utf-8")
+
+    def cerrar(self):
+        return b""
+
+
+class _CsvWriter(_NdjsonWriter):
+    def inicio(self):
+        return self.escribir([self.columnas])
+
+    def escribir(self, filas):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        return buffer.getvalue().encode("utf-8")
+
+
+class _Sumidero:
+    """
+    Fichero de solo escritura que acumula lo escrito hasta que se recoge con
+    drenar(). Mantiene la posición total, que Parquet usa en el pie del fichero.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drenar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def _tipo_arrow(tipo):
+    import pyarrow as pa
+
+    if isinstance(tipo, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(tipo, (sqltypes.Float, sqltypes.Numeric)):
+        return pa.float64()
+    if isinstance(tipo, sqltypes.Boolean):
+        return pa.bool_()
+    if isinstance(tipo, sqltypes.DateTime):
+        return pa.timestamp("us", tz="UTC" if tipo.timezone else None)
+    if isinstance(tipo, sqltypes.Date):
+        return pa.date32()
+    if isinstance(tipo, sqltypes.Time):
+        return pa.time64("us")
+    return pa.string()
+
+
+class _ArrowWriter:
+    def __init__(self, tabla, columnas):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = pa.schema([(nombre, _tipo_arrow(tabla.c[nombre].type)) for nombre in columnas])
+        self.sumidero = _Sumidero()
+        self.writer = self.abrir()
+
+    def abrir(self):
+        return self.pa.ipc.new_stream(self.sumidero, self.schema)
+
+    def inicio(self):
+        return self.sumidero.drenar()
+
+    def batch(self, filas):
+        valores = list(zip(*filas))
+        return self.pa.RecordBatch.from_arrays(
+            [self.pa.array(columna, type=campo.type) for columna, campo in zip(valores, self.schema)],
+            schema=self.schema,
+        )
+
+    def escribir(self, filas):
+        if filas:
+            self.writer.write_batch(self.batch(filas))
+        return self.sumidero.drenar()
+
+    def cerrar(self):
+        self.writer.close()
+        return self.sumidero.drenar()
+
+
+class _ParquetWriter(_ArrowWriter):
+    def abrir(self):
+        import pyarrow.parquet as pq
+
+        self.pendientes = []
+        self.filas_pendientes = 0
+        return pq.ParquetWriter(self.sumidero, self.schema, compression="zstd")
+
+    def escribir(self, filas):
+        if filas:
+            self.pendientes.append(self.batch(filas))
+            self.filas_pendientes += len(filas)
+        if self.filas_pendientes >= EXPORT_PARQUET_ROW_GROUP:
+            self._volcar()
+        return self.sumidero.drenar()
+
+    def _volcar(self):
+        if self.pendientes:
+            self.writer.write_table(self.pa.Table.from_batches(self.pendientes), row_group_size=self.filas_pendientes)
+            self.pendientes, self.filas_pendientes = [], 0
+
+    def cerrar(self):
+        self._volcar()
+        return super().cerrar()
+
+
+WRITERS = {
+    "ndjson": _NdjsonWriter,
+    "csv": _CsvWriter,
+    "arrow": _ArrowWriter,
+    "parquet": _ParquetWriter,
+}
+
+
+def stream_tabla(tabla, formato, columnas, season=None):
+    """
+    Generador síncrono con los bloques serializados de la tabla. El primer
+    valor incluye la cabecera del formato y el primer bloque.
+    """
+    filas = 0
+    with database.open_session() as db:
+        try:
+            if formato in FORMATOS_ARROW:
+                tabla = _reflejar(db.connection(), tabla.name)
+            writer = WRITERS[formato](tabla, columnas)
+            bloques = db.execute(_select(tabla, columnas, season)).partitions()
+            primero = next(bloques, [])
+            filas += len(primero)
+            yield writer.inicio() + writer.escribir(primero)
+            for bloque in bloques:
+                filas += len(bloque)
+                datos = writer.escribir(bloque)
+                if datos:
+                    yield datos
+            yield writer.cerrar()
+        except Exception as e:
+            logger.error(f"Error al exportar {tabla.name}: {e}")
+            raise
+    logger.info(f"Exportada la tabla {tabla.name} en {formato}: {filas} filas")
+
+
+async def stream_tabla_async(tabla, formato, columnas, season=None):
+    """
+    Generador asíncrono con los bloques serializados de la tabla. El primer
+    valor incluye la cabecera del formato y el primer bloque.
+    """
+    filas = 0
+    async with await database.open_async_session() as db:
+        try:
+            if formato in FORMATOS_ARROW:
+                nombre = tabla.name
+                tabla = await db.run_sync(lambda session: _reflejar(session.connection(), nombre))
+            writer = WRITERS[formato](tabla, columnas)
+            bloques = (await db.stream(_select(tabla, columnas, season))).partitions()
+            primero = await anext(bloques, [])
+            filas += len(primero)
+            yield writer.inicio() + writer.escribir(primero)
+            async for bloque in bloques:
+                filas += len(bloque)
+                datos = writer.escribir(bloque)
+                if datos:
+                    yield datos
+            yield writer.cerrar()
+        except Exception as e:
+            logger.error(f"Error al exportar {tabla.name}: {e}")
+            raise
+    logger.info(f"Exportada la tabla {tabla.name} en {formato}: {filas} filas")
+
+
+def _peticion(nombre, formato, columns):
+    """
+    Valida una petición de GET /export/{tabla}. Devuelve (tabla, columnas) o
+    lanza 404 (tabla), 400 (formato o columnas) o 501 (pyarrow no instalado).
+    """
+    tabla = tabla_exportable(nombre)
+    if tabla is None:
+        raise HTTPException(status_code=404, detail=f"Tabla no exportable: {nombre}")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+    if not formato_disponible(formato):
+        raise HTTPException(status_code=501, detail=f"El formato {formato} necesita pyarrow")
+    try:
+        return tabla, columnas_exportadas(tabla, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _streaming(cuerpo, nombre, formato):
+    return StreamingResponse(
+        cuerpo,
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'},
+    )
+
+
+def _error(nombre):
+    """
+    500 de un error al leer el primer bloque. El error se registra con la
+    traza pero no se devuelve: puede incluir texto del driver o de Arrow.
+    """
+    logger.exception(f"Error al exportar {nombre} antes de enviar la respuesta")
+    return HTTPException(status_code=500, detail=f"Error al exportar {nombre}")
+
+
+def respuesta(nombre, formato, columns=None, season=None):
+    """
+    Respuesta de GET /export/{tabla} en modo síncrono. Lee el primer bloque
+    antes de enviar las cabeceras: si falla, responde 500.
+    """
+    tabla, columnas = _peticion(nombre, formato, columns)
+    cuerpo = stream_tabla(tabla, formato, columnas, season)
+    try:
+        primero = next(cuerpo)
+    except Exception as e:
+        raise _error(nombre) from e
+    return _streaming(itertools.chain([primero], cuerpo), nombre, formato)
+
+
+async def _seguir(primero, cuerpo):
+    yield primero
+    async for datos in cuerpo:
+        yield datos
+
+
+async def respuesta_async(nombre, formato, columns=None, season=None):
+    """
+    Respuesta de GET /export/{tabla} en modo async. Lee el primer bloque
+    antes de enviar las cabeceras: si falla, responde 500.
+    """
+    tabla, columnas = _peticion(nombre, formato, columns)
+    cuerpo = stream_tabla_async(tabla, formato, columnas, season)
+    try:
+        primero = await anext(cuerpo)
+    except Exception as e:
+        raise _error(nombre) from e
+    return _streaming(_seguir(primero, cuerpo), nombre, formato)
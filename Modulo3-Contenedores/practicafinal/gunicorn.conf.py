@@ -0,0 +1,80 @@
+"""
+Configuración de gunicorn para producción: un proceso maestro y varios workers
+de uvicorn, cada uno con su event loop, su threadpool y su pool de conexiones.
+
+    gunicorn -c gunicorn.conf.py formulaUnoBackend:app
+
+Número de workers: WEB_CONCURRENCY si está definido y, si no, uno por CPU
+disponible para el contenedor (teniendo en cuenta el límite de CPU del cgroup,
+por ejemplo docker run --cpus=2, y no solo las CPU de la máquina).
+
+Señales al proceso maestro (PID 1 en el contenedor):
+    HUP   arranca workers nuevos con el código actual y para los anteriores
+          cuando terminan sus peticiones en curso (recarga sin cortes).
+    TERM  parada ordenada: cada worker termina sus peticiones en curso durante
+          como mucho GRACEFUL_TIMEOUT segundos.
+    TTIN / TTOU  añade / quita un worker.
+"""
+
+import math
+import os
+
+
+def _cpus():
+    """
+    CPU disponibles para el proceso: afinidad y límite de CPU del cgroup v2.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if cuota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(cuota) / int(periodo))))
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or _cpus()
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Segundos que tiene un worker para terminar sus peticiones al recargar o parar
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# Segundos sin responder al maestro tras los que se reinicia un worker
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Reinicia cada worker tras MAX_REQUESTS peticiones (0 = nunca), con un margen
+# aleatorio para que no se reinicien todos a la vez
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# La aplicación se importa en cada worker y no en el maestro: así HUP carga el
+# código nuevo y ningún worker hereda conexiones abiertas por otro proceso
+preload_app = False
+
+accesslog = "-" if os.getenv("ACCESS_LOG", "false").lower() in ("1", "true", "yes") else None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Conexiones que admite Postgres, para avisar si los pools de los workers no caben.
+# Se leen las mismas variables que database.py sin importarlo: el maestro no
+# importa la aplicación
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+
+def on_starting(server):
+    """
+    Avisa si los pools de todos los workers superan las conexiones de Postgres.
+    Las tablas no se crean aquí sino con python migrate.py create.
+    """
+    server.log.info(f"Arrancando {workers} workers")
+    conexiones = workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    if not os.getenv("DATABASE_URL", "").startswith("sqlite") and conexiones > DB_MAX_CONNECTIONS:
+        server.log.warning(
+            f"{workers} workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) = {conexiones} conexiones, "
+            f"más que DB_MAX_CONNECTIONS ({DB_MAX_CONNECTIONS}): reduce el pool o los workers"
+        )
@@ -0,0 +1,306 @@
+"""
+Métricas de las peticiones: latencia por ruta, consultas a la base de datos y
+tiempo de serialización.
+
+MetricsMiddleware mide cada petición y guarda en una ContextVar una Medicion
+a la que los eventos de SQLAlchemy (instrumentar) suman cada consulta y su
+duración, y json_response (responses.py) el tiempo de serialización. La
+ContextVar llega a los endpoints síncronos del threadpool y a los greenlets de
+las sesiones asíncronas, así que no hace falta pasar nada a los endpoints.
+
+Cada respuesta lleva la cabecera Server-Timing con el tiempo en la base de
+datos, el número de consultas, la serialización y el total hasta enviar las
+cabeceras. GET /metrics devuelve los histogramas y contadores acumulados en
+formato de texto de Prometheus. Con varios workers cada proceso tiene sus
+propias métricas y Prometheus las suma.
+
+El coste por petición es un perf_counter por consulta y un lock al final de la
+petición; se desactiva con METRICS_ENABLED=false.
+"""
+
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Medicion:
+    """
+    Consultas, tiempo en la base de datos y tiempo de serialización de una petición.
+    """
+
+    __slots__ = ("scope", "consultas", "db", "serializacion")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.consultas = 0
+        self.db = 0.0
+        self.serializacion = 0.0
+
+    def server_timing(self, total):
+        return (f'db;dur={self.db * 1000:.1f};desc="{self.consultas} consultas", '
+                f"ser;dur={self.serializacion * 1000:.1f}, total;dur={total * 1000:.1f}")
+
+
+_medicion = ContextVar("medicion", default=None)
+
+
+def sumar_serializacion(segundos):
+    """
+    Suma tiempo de serialización a la petición en curso, si la hay.
+    """
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.serializacion += segundos
+
+
+def ruta_actual():
+    """
+    Método y plantilla de la ruta de la petición en curso ("GET /results"), o
+    None fuera de una petición o con METRICS_ENABLED=false.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        return None
+    return f"{medicion.scope['method']} {_ruta(medicion.scope)}"
+
+
+# --- Eventos de SQLAlchemy ---
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_inicio = time.perf_counter()
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion.get()
+    if medicion is not None:
+        medicion.consultas += 1
+        medicion.db += time.perf_counter() - context._metrics_inicio
+
+
+def instrumentar(engine):
+    """
+    Cuenta las consultas de un engine síncrono (o el sync_engine de uno
+    asíncrono) y su duración en la petición en curso.
+    """
+    if event.contains(engine, "after_cursor_execute", _despues_de_consulta):
+        # create_app() puede llamarse más de una vez sobre los mismos engines
+        return
+    event.listen(engine, "before_cursor_execute", _antes_de_consulta)
+    event.listen(engine, "after_cursor_execute", _despues_de_consulta)
+
+
+# --- Registro de métricas ---
+
+class _Histograma:
+    __slots__ = ("buckets", "suma", "total")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(BUCKETS, valor)
+        if indice < len(BUCKETS):
+            self.buckets[indice] += 1
+        self.suma += valor
+        self.total += 1
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(**etiquetas):
+    valores = ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in etiquetas.items())
+    return "{" + valores + "}" if valores else ""
+
+
+def _metrica(lineas, nombre, tipo, ayuda, muestras):
+    """
+    Añade a lineas una métrica con sus muestras [(etiquetas, valor)].
+    """
+    lineas.append(f"# HELP {nombre} {ayuda}")
+    lineas.append(f"# TYPE {nombre} {tipo}")
+    for etiquetas, valor in muestras:
+        lineas.append(f"{nombre}{_etiquetas(**etiquetas)} {valor}")
+
+
+class Registro:
+    """
+    Métricas acumuladas de las peticiones de este proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = defaultdict(int)  # (método, ruta, estado) -> peticiones
+        self.latencias = defaultdict(_Histograma)  # (método, ruta) -> histograma
+        self.consultas = defaultdict(int)  # (método, ruta) -> consultas
+        self.db = defaultdict(float)  # (método, ruta) -> segundos en la base de datos
+        self.serializacion = defaultdict(float)  # (método, ruta) -> segundos serializando
+        self.en_curso = 0
+
+    def empezar(self):
+        with self._lock:
+            self.en_curso += 1
+
+    def observar(self, metodo, ruta, estado, segundos, medicion):
+        clave = (metodo, ruta)
+        with self._lock:
+            self.en_curso -= 1
+            self.peticiones[(metodo, ruta, estado)] += 1
+            self.latencias[clave].observar(segundos)
+            self.consultas[clave] += medicion.consultas
+            self.db[clave] += medicion.db
+            self.serializacion[clave] += medicion.serializacion
+
+    def exposicion(self):
+        """
+        Líneas en formato de texto de Prometheus.
+        """
+        with self._lock:
+            peticiones = dict(self.peticiones)
+            latencias = {clave: (list(h.buckets), h.suma, h.total) for clave, h in self.latencias.items()}
+            consultas, db, serializacion = dict(self.consultas), dict(self.db), dict(self.serializacion)
+            en_curso = self.en_curso
+
+        lineas = []
+        _metrica(lineas, "http_requests_total", "counter", "Peticiones atendidas.", [
+            ({"method": metodo, "route": ruta, "status": estado}, total)
+            for (metodo, ruta, estado), total in sorted(peticiones.items())
+        ])
+        _metrica(lineas, "http_requests_in_progress", "gauge", "Peticiones en curso.", [({}, en_curso)])
+
+        _metrica(lineas, "http_request_duration_seconds", "histogram", "Latencia de las peticiones por ruta.", [])
+        for (metodo, ruta), (buckets, suma, total) in sorted(latencias.items()):
+            acumulado = 0
+            for limite, cuenta in zip(BUCKETS + ("+Inf",), buckets + [total - sum(buckets)]):
+                acumulado += cuenta
+                lineas.append(f"http_request_duration_seconds_bucket{_etiquetas(method=metodo, route=ruta, le=limite)} {acumulado}")
+            lineas.append(f"http_request_duration_seconds_sum{_etiquetas(method=metodo, route=ruta)} {suma:.6f}")
+            lineas.append(f"http_request_duration_seconds_count{_etiquetas(method=metodo, route=ruta)} {total}")
+
+        for nombre, ayuda, valores in (
+            ("http_request_db_queries_total", "Consultas a la base de datos por ruta.", consultas),
+            ("http_request_db_seconds_total", "Tiempo en la base de datos por ruta.", db),
+            ("http_request_serialization_seconds_total", "Tiempo serializando JSON por ruta.", serializacion),
+        ):
+            _metrica(lineas, nombre, "counter", ayuda, [
+                ({"method": metodo, "route": ruta}, round(valor, 6)) for (metodo, ruta), valor in sorted(valores.items())
+            ])
+        return lineas
+
+
+registro = Registro()
+
+
+def metricas_pool(pools):
+    """
+    Líneas de Prometheus con el estado de los pools de conexiones
+    ({nombre: (engine, PoolMetrics)}, ver database.pools).
+    """
+    muestras = defaultdict(list)
+    for nombre, (engine, metricas) in pools.items():
+        pool = engine.pool
+        etiquetas = {"pool": nombre}
+        if hasattr(pool, "size"):
+            muestras["db_pool_size"].append((etiquetas, pool.size()))
+            muestras["db_pool_overflow"].append((etiquetas, max(pool.overflow(), 0)))
+        muestras["db_pool_checked_out"].append((etiquetas, metricas.in_use))
+        muestras["db_pool_checked_out_max"].append((etiquetas, metricas.in_use_max))
+        muestras["db_pool_checkouts_total"].append((etiquetas, metricas.checkouts))
+        muestras["db_pool_checkout_timeouts_total"].append((etiquetas, metricas.timeouts))
+        muestras["db_pool_checkout_wait_seconds_total"].append((etiquetas, round(metricas.wait_total, 6)))
+        muestras["db_pool_checkout_wait_max_seconds"].append((etiquetas, round(metricas.wait_max, 6)))
+
+    lineas = []
+    for nombre, tipo, ayuda in (
+        ("db_pool_size", "gauge", "Conexiones permanentes del pool."),
+        ("db_pool_overflow", "gauge", "Conexiones abiertas por encima de pool_size."),
+        ("db_pool_checked_out", "gauge", "Conexiones en uso."),
+        ("db_pool_checked_out_max", "gauge", "Máximo de conexiones en uso a la vez."),
+        ("db_pool_checkouts_total", "counter", "Conexiones obtenidas del pool."),
+        ("db_pool_checkout_timeouts_total", "counter", "Esperas de conexión que han superado pool_timeout."),
+        ("db_pool_checkout_wait_seconds_total", "counter", "Tiempo total esperando una conexión."),
+        ("db_pool_checkout_wait_max_seconds", "gauge", "Espera máxima para obtener una conexión."),
+    ):
+        if muestras[nombre]:
+            _metrica(lineas, nombre, tipo, ayuda, muestras[nombre])
+    return lineas
+
+
+def metricas_cache(stats):
+    """
+    Líneas de Prometheus con los contadores de la caché de respuestas
+    ({endpoint: snapshot}, ver ResponseCache.stats).
+    """
+    lineas = []
+    for nombre, campo, tipo, ayuda in (
+        ("response_cache_entries", "entradas", "gauge", "Respuestas guardadas en la caché."),
+        ("response_cache_hits_total", "hits", "counter", "Respuestas servidas desde la caché."),
+        ("response_cache_misses_total", "misses", "counter", "Respuestas generadas por no estar en la caché."),
+        ("response_cache_coalesced_total", "coalesced", "counter", "Peticiones que esperaron a otra con la misma clave."),
+        ("response_cache_not_modified_total", "not_modified", "counter", "Respuestas 304."),
+        ("response_cache_invalidations_total", "invalidations", "counter", "Invalidaciones."),
+    ):
+        _metrica(lineas, nombre, tipo, ayuda, [
+            ({"endpoint": endpoint}, snapshot[campo]) for endpoint, snapshot in sorted(stats.items())
+        ])
+    return lineas
+
+
+# --- Middleware ---
+
+def _ruta(scope):
+    # Plantilla de la ruta (/results/{result_id}) y no la URL, para no crear una serie por id
+    route = scope.get("route")
+    return getattr(route, "path", "desconocida")
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición y añade la cabecera Server-Timing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = Medicion(scope)
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+        registro.empezar()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                MutableHeaders(scope=mensaje).append(
+                    "Server-Timing", medicion.server_timing(time.perf_counter() - inicio)
+                )
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion.reset(token)
+            registro.observar(scope["method"], _ruta(scope), estado, time.perf_counter() - inicio, medicion)
@@ -0,0 +1,132 @@
+"""
+Aplica el esquema de la base de datos (claves primarias, claves foráneas e índices)
+sobre la base de datos de DATABASE_URL.
+
+En Postgres ejecuta dbformula1_bueno/03_schema.sql, el mismo script que usa el
+contenedor al inicializar un volumen nuevo, de modo que también sirve para
+volúmenes que ya tenían datos. En SQLite crea las tablas y los índices
+declarados en los modelos que todavía no existan. En ambos casos crea las
+tablas de agregados (aggregates.py) y las recalcula desde results, y añade a
+results las columnas de COLUMNAS_NUEVAS.
+
+Con create solo crea las tablas que falten, sin tocar las que ya existen salvo
+para añadir las columnas de COLUMNAS_NUEVAS, y rellena los agregados si están
+vacíos. Es el paso que se ejecuta una vez por despliegue antes de arrancar la
+API (servicio migrate de docker-compose.yml): la API no ejecuta DDL al arrancar.
+
+Uso:
+    python migrate.py          # aplica el esquema y recalcula los agregados
+    python migrate.py create   # crea las tablas que falten
+"""
+
+import argparse
+import logging
+from pathlib import Path
+
+from sqlalchemy import func, inspect, select, text, tuple_, update
+
+import aggregates
+import crud
+from database import engine, is_sqlite
+from models.basemodel import Base
+from models import results, circuit, races, standings
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+SCHEMA_SQL = Path(__file__).parent / "dbformula1_bueno" / "03_schema.sql"
+
+# Columnas de results que no están en el volcado original: clave de las cargas
+# con upsert y marca de los borrados con RESULTS_SOFT_DELETE (ver crud.py)
+COLUMNAS_NUEVAS = ("idempotencyKey", "deletedAt")
+
+
+def migrate_postgres(bind):
+    """
+    Ejecuta el script de esquema en una única transacción.
+    """
+    conn = bind.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA_SQL.read_text(encoding="utf-8"))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def migrate_sqlite(bind):
+    """
+    Crea las tablas que falten y los índices de los modelos en tablas existentes.
+    """
+    Base.metadata.create_all(bind=bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+def ensure_results_columns(bind):
+    """
+    Añade a results las columnas de COLUMNAS_NUEVAS y sus índices si no existen, y
+    asigna la clave natural (crud.clave_natural) a los resultados sin clave cuyo
+    par (raceId, driverId) es único, para que un upsert los encuentre. Los pares
+    repetidos (coches compartidos en los años 50) se quedan sin clave.
+    """
+    tabla = results.ResultsTB.__table__
+    with bind.begin() as conn:
+        existentes = {columna["name"] for columna in inspect(conn).get_columns("results")}
+        for nombre in COLUMNAS_NUEVAS:
+            if nombre not in existentes:
+                tipo = tabla.c[nombre].type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE results ADD COLUMN "{nombre}" {tipo}'))
+        for index in tabla.indexes:
+            if {columna.name for columna in index.columns} & set(COLUMNAS_NUEVAS):
+                index.create(bind=conn, checkfirst=True)
+        unicos = (
+            select(tabla.c.raceId, tabla.c.driverId)
+            .group_by(tabla.c.raceId, tabla.c.driverId)
+            .having(func.count() == 1)
+        )
+        asignadas = conn.execute(
+            update(tabla)
+            .where(tabla.c.idempotencyKey.is_(None), tuple_(tabla.c.raceId, tabla.c.driverId).in_(unicos))
+            .values(idempotencyKey=crud.clave_natural_sql())
+        ).rowcount
+    if asignadas:
+        logger.info(f"Clave natural asignada a {asignadas} resultados")
+
+
+def migrate(bind=engine):
+    if is_sqlite(str(bind.url)):
+        migrate_sqlite(bind)
+    else:
+        migrate_postgres(bind)
+    ensure_results_columns(bind)
+    Base.metadata.create_all(bind=bind, tables=aggregates.TABLAS)
+    with bind.begin() as conn:
+        aggregates.rebuild(conn)
+    logger.info(f"Esquema aplicado sobre {bind.url.render_as_string(hide_password=True)}")
+
+
+def create_tables(bind=engine):
+    """
+    Crea las tablas de los modelos que no existan, añade a results las columnas
+    de COLUMNAS_NUEVAS y rellena los agregados si están vacíos y results no.
+    """
+    Base.metadata.create_all(bind=bind)
+    ensure_results_columns(bind)
+    aggregates.ensure_populated(bind)
+    logger.info(f"Tablas creadas en {bind.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Esquema de la base de datos de Fórmula 1")
+    parser.add_argument("accion", nargs="?", choices=["schema", "create"], default="schema")
+    args = parser.parse_args()
+    if args.accion == "create":
+        create_tables()
+    else:
+        migrate()
@@ -1,7 +1,7 @@
 from typing import Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -12,11 +12,12 @@ __all__ = [
     "Column",
     "Integer",
     "String",
-    # "Float",
+    "Float",
     # "Date",
     "DateTime",
     # "Boolean",
     "ForeignKey",
+    "Index",
     # "Text",
     "relationship",
     "BaseModel",
@@ -22,10 +22,24 @@ class ResultsTB(Base):
     fastestLapTime = Column(String)
     fastestLapSpeed = Column(String)
     statusId = Column(Integer, index=True)
+    # Clave de las cargas idempotentes (POST con upsert o Idempotency-Key, ver crud.py)
+    idempotencyKey = Column(String)
+    # Marca de los resultados borrados con RESULTS_SOFT_DELETE hasta que se purgan (ver purge.py)
+    deletedAt = Column(DateTime)
 
     driver = relationship("DriversTB", back_populates="results")
     race = relationship("RacesTB", back_populates="results")
 
+    # Mismo índice que dbformula1_bueno/03_schema.sql: ganador de cada carrera
+    __table_args__ = (
+        Index("ix_results_race_position", raceId, position),
+        # Único: INSERT ... ON CONFLICT ("idempotencyKey"). Admite varios NULL
+        Index("ux_results_idempotency_key", idempotencyKey, unique=True),
+        # Parcial: solo las filas pendientes de purgar
+        Index("ix_results_deleted_at", deletedAt,
+              postgresql_where=deletedAt.is_not(None), sqlite_where=deletedAt.is_not(None)),
+    )
+
 class Result(BaseModel):
     resultId: Optional[int] = Field(None, description="ID del resultado")
     raceId: int = Field(..., description="ID de la carrera")
@@ -45,3 +59,14 @@ class Result(BaseModel):
     fastestLapTime: Optional[str] = Field(None, description="Tiempo de la vuelta rápida")
     fastestLapSpeed: Optional[str] = Field(None, description="Velocidad de la vuelta rápida")
     statusId: int = Field(..., description="ID del estado del resultado")
+
+
+class ResultsDelete(BaseModel):
+    resultIds: Optional[list[int]] = Field(None, min_length=1, max_length=10000, description="IDs de los resultados a eliminar")
+    raceId: Optional[int] = Field(None, description="Elimina todos los resultados de esta carrera")
+
+    @model_validator(mode="after")
+    def una_condicion(self):
+        if (self.resultIds is None) == (self.raceId is None):
+            raise ValueError("Indica resultIds o raceId, pero no los dos")
+        return self
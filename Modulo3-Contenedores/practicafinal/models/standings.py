@@ -0,0 +1,38 @@
+from .basemodel import *
+
+# Tablas de agregados precalculados a partir de results (ver aggregates.py).
+# Se mantienen de forma incremental en la misma transacción que cada escritura
+# en results, de modo que las clasificaciones se leen sin agregar results.
+
+class DriverStandingsTB(Base):
+    __tablename__ = "driver_standings"
+
+    season = Column(Integer, primary_key=True)
+    driverId = Column(Integer, primary_key=True)
+    points = Column(Float, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    results = Column(Integer, nullable=False, default=0)
+
+    # Clasificación de una temporada por puntos
+    __table_args__ = (Index("ix_driver_standings_season_points", season, points.desc()),)
+
+class ConstructorStandingsTB(Base):
+    __tablename__ = "constructor_standings"
+
+    season = Column(Integer, primary_key=True)
+    constructorId = Column(Integer, primary_key=True)
+    points = Column(Float, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    results = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_constructor_standings_season_points", season, points.desc()),)
+
+class CircuitWinsTB(Base):
+    __tablename__ = "circuit_wins"
+
+    circuitId = Column(Integer, primary_key=True)
+    driverId = Column(Integer, primary_key=True)
+    wins = Column(Integer, nullable=False, default=0)
+
+    # Pilotos con más victorias en un circuito
+    __table_args__ = (Index("ix_circuit_wins_circuit_wins", circuitId, wins.desc()),)
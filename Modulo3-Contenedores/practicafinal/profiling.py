@@ -0,0 +1,261 @@
+"""
+Perfiles de CPU bajo demanda de un worker en producción.
+
+Perfil por muestreo: muestrear() toma cada intervalo la pila de todos los hilos
+del proceso (sys._current_frames), tanto el del event loop como los del
+threadpool donde corren los endpoints síncronos, durante un número acotado de
+segundos. El resultado se devuelve en formato de pilas colapsadas (flamegraph.pl,
+speedscope) o en el formato JSON de speedscope, con una raíz por hilo. Incluye
+los hilos ociosos (esperando en select o en la cola del threadpool).
+
+Perfil de una petición: con las cabeceras X-Profile: 1 y X-Debug-Token la
+petición se ejecuta con cProfile activo en el hilo donde corre el endpoint
+(PerfilRoute envuelve cada endpoint) y la respuesta lleva X-Profile-Id para
+descargar el perfil después. En modo async cProfile también recoge lo que haga
+el event loop con otras peticiones mientras el endpoint espera.
+
+Todo esto solo existe si se define DEBUG_TOKEN y exige enviarlo en la cabecera
+X-Debug-Token.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+
+from fastapi import Header, HTTPException
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+
+# Token de las rutas de depuración: sin él no están disponibles
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+# Perfiles de peticiones que se guardan para descargarlos
+DEBUG_PROFILE_KEEP = int(os.getenv("DEBUG_PROFILE_KEEP", "20"))
+
+
+def token_valido(token):
+    return bool(DEBUG_TOKEN) and token is not None and secrets.compare_digest(token, DEBUG_TOKEN)
+
+
+def requerir_admin(x_debug_token: str = Header(None)):
+    """
+    Dependencia de las rutas de depuración: 404 si no hay DEBUG_TOKEN y 403 si
+    el token enviado no coincide.
+    """
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_valido(x_debug_token):
+        raise HTTPException(status_code=403, detail="X-Debug-Token no válido")
+
+
+# --- Perfil por muestreo ---
+
+_muestreando = threading.Lock()
+
+
+def _marco(code):
+    ruta = code.co_filename.replace("\\", "/").split("/")
+    return f"{code.co_name} ({'/'.join(ruta[-2:])}:{code.co_firstlineno})"
+
+
+def muestrear(segundos, intervalo):
+    """
+    Toma muestras de la pila de todos los hilos durante segundos, una cada
+    intervalo segundos. Devuelve Counter {(hilo, marco raíz, ..., marco hoja): muestras}.
+    Lanza RuntimeError si ya hay otro muestreo en curso.
+    """
+    if not _muestreando.acquire(blocking=False):
+        raise RuntimeError("Ya hay un perfil en curso")
+    try:
+        propio = threading.get_ident()
+        pilas = Counter()
+        nombres = {}
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            frames = sys._current_frames()
+            if frames.keys() - nombres.keys():
+                nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == propio:
+                    continue
+                pila = []
+                while frame is not None:
+                    pila.append(_marco(frame.f_code))
+                    frame = frame.f_back
+                pila.append(nombres.get(ident, f"hilo {ident}"))
+                pilas[tuple(reversed(pila))] += 1
+            time.sleep(intervalo)
+        return pilas
+    finally:
+        _muestreando.release()
+
+
+def colapsadas(pilas):
+    """
+    Pilas en formato colapsado: "hilo;raíz;...;hoja muestras" por línea.
+    """
+    return "".join(f"{';'.join(pila)} {muestras}\n" for pila, muestras in pilas.most_common())
+
+
+def speedscope(pilas, intervalo, nombre):
+    """
+    Pilas en el formato JSON de speedscope, un perfil por hilo.
+    """
+    marcos, indices, perfiles = [], {}, {}
+    for pila, muestras in pilas.items():
+        hilo, *resto = pila
+        muestra = []
+        for marco in resto:
+            if marco not in indices:
+                indices[marco] = len(marcos)
+                marcos.append({"name": marco})
+            muestra.append(indices[marco])
+        perfil = perfiles.setdefault(hilo, {"samples": [], "weights": []})
+        perfil["samples"].append(muestra)
+        perfil["weights"].append(muestras * intervalo)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": nombre,
+        "exporter": "formulaUnoBackend",
+        "shared": {"frames": marcos},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": hilo,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(perfil["weights"]),
+                "samples": perfil["samples"],
+                "weights": perfil["weights"],
+            }
+            for hilo, perfil in sorted(perfiles.items())
+        ],
+    }
+
+
+# --- Perfil de una petición ---
+
+class _PerfilPeticion:
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.profile = cProfile.Profile()
+
+
+_perfil = ContextVar("perfil", default=None)
+# Un solo perfil de petición a la vez: cProfile no admite dos activos en el mismo hilo
+_perfilando = threading.Lock()
+perfiles = OrderedDict()
+
+
+def _guardar(perfil):
+    perfiles[perfil.id] = perfil.profile
+    while len(perfiles) > DEBUG_PROFILE_KEEP:
+        perfiles.popitem(last=False)
+
+
+def informe(profile, orden="cumulative", limite=60):
+    """
+    Texto de pstats con las limite funciones más costosas.
+    """
+    salida = io.StringIO()
+    pstats.Stats(profile, stream=salida).sort_stats(orden).print_stats(limite)
+    return salida.getvalue()
+
+
+def volcado(profile):
+    """
+    Perfil en formato binario de pstats (para snakeviz o pstats.Stats).
+    """
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+def _perfilable(endpoint):
+    """
+    Envuelve el endpoint para ejecutarlo con cProfile si la petición lo ha pedido.
+    functools.wraps mantiene la firma que FastAPI usa para las dependencias.
+    """
+    if getattr(endpoint, "_perfilable", False):
+        # include_router vuelve a crear las rutas con el endpoint ya envuelto
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def envoltorio(*args, **kwargs):
+            perfil = _perfil.get()
+            if perfil is None:
+                return await endpoint(*args, **kwargs)
+            perfil.profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                perfil.profile.disable()
+    else:
+        @functools.wraps(endpoint)
+        def envoltorio(*args, **kwargs):
+            perfil = _perfil.get()
+            if perfil is None:
+                return endpoint(*args, **kwargs)
+            perfil.profile.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                perfil.profile.disable()
+    envoltorio._perfilable = True
+    return envoltorio
+
+
+class PerfilRoute(APIRoute):
+    """
+    Ruta de FastAPI cuyo endpoint se puede perfilar petición a petición.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, _perfilable(endpoint) if DEBUG_TOKEN else endpoint, **kwargs)
+
+
+class PerfilMiddleware:
+    """
+    Middleware ASGI que activa el perfil de la petición con X-Profile: 1 y un
+    X-Debug-Token válido, y devuelve su identificador en X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get("x-profile") != "1" or not token_valido(headers.get("x-debug-token")):
+            await self.app(scope, receive, send)
+            return
+        if not _perfilando.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        perfil = _PerfilPeticion()
+        _guardar(perfil)
+        token = _perfil.set(perfil)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                MutableHeaders(scope=mensaje).append("X-Profile-Id", perfil.id)
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil.reset(token)
+            _perfilando.release()
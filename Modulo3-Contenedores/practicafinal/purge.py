@@ -0,0 +1,80 @@
+"""
+Purga en segundo plano de los resultados borrados con RESULTS_SOFT_DELETE.
+
+Con RESULTS_SOFT_DELETE=true, DELETE /results/{id} y DELETE /results/bulk solo
+marcan las filas (UPDATE ... SET "deletedAt") y restan su aportación a los
+agregados. Las consultas de la API ignoran las filas marcadas, y cada worker
+las borra cada RESULTS_PURGE_INTERVAL segundos en lotes de RESULTS_PURGE_BATCH
+filas, cada lote en su propia transacción para no retener bloqueos ni escribir
+de golpe el borrado de una temporada entera. En Postgres cada worker salta las
+filas que está purgando otro (FOR UPDATE SKIP LOCKED).
+"""
+
+import asyncio
+import logging
+import os
+
+from sqlalchemy import delete, select
+
+from database import async_engine, engine
+from models.results import ResultsTB
+
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre purgas
+RESULTS_PURGE_INTERVAL = float(os.getenv("RESULTS_PURGE_INTERVAL", "10"))
+# Filas borradas por transacción
+RESULTS_PURGE_BATCH = int(os.getenv("RESULTS_PURGE_BATCH", "500"))
+
+
+def marcados(lote=RESULTS_PURGE_BATCH, postgres=False):
+    """
+    resultId de hasta lote filas marcadas (índice parcial ix_results_deleted_at).
+    """
+    stmt = select(ResultsTB.resultId).where(ResultsTB.deletedAt.is_not(None)).limit(lote)
+    return stmt.with_for_update(skip_locked=True) if postgres else stmt
+
+
+def purgar_lote(conn):
+    """
+    Borra un lote de filas marcadas. Devuelve las filas borradas.
+    """
+    pendientes = marcados(postgres=conn.dialect.name == "postgresql")
+    return conn.execute(delete(ResultsTB).where(ResultsTB.resultId.in_(pendientes))).rowcount
+
+
+def _purgar_lote_sync():
+    with engine.begin() as conn:
+        return purgar_lote(conn)
+
+
+async def purgar():
+    """
+    Borra todas las filas marcadas, un lote por transacción. Devuelve el total.
+    """
+    total = 0
+    while True:
+        if async_engine is not None:
+            async with async_engine.begin() as conn:
+                borradas = await conn.run_sync(purgar_lote)
+        else:
+            borradas = await asyncio.to_thread(_purgar_lote_sync)
+        total += borradas
+        if borradas < RESULTS_PURGE_BATCH:
+            return total
+
+
+async def purgar_periodicamente():
+    """
+    Tarea de cada worker: purga las filas marcadas cada RESULTS_PURGE_INTERVAL segundos.
+    """
+    while True:
+        await asyncio.sleep(RESULTS_PURGE_INTERVAL)
+        try:
+            total = await purgar()
+        except Exception as e:
+            logger.warning(f"Error al purgar los resultados borrados: {e}")
+        else:
+            if total:
+                logger.info(f"Purgados {total} resultados borrados")
@@ -0,0 +1,290 @@
+"""
+Capa de consultas sobre las tablas results, races, drivers y circuits.
+
+Las funciones devuelven sentencias select() que se ejecutan igual con una
+Session síncrona (db.execute) que con una AsyncSession (await db.execute).
+En lugar de cargar objetos ORM y recorrer sus relaciones (una consulta extra
+por cada relación perezosa y fila), se proyectan solo las columnas necesarias
+con los JOIN imprescindibles, de modo que cada endpoint hace una única consulta
+independientemente del número de filas.
+
+Las funciones contenido_* ejecutan la consulta de cada endpoint de lectura y
+construyen el contenido de su respuesta. Reciben una Session síncrona: los
+endpoints del modo async las ejecutan con AsyncSession.run_sync, de modo que
+los dos routers comparten la consulta, los errores y la forma de la respuesta.
+"""
+
+import base64
+import hashlib
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import Table, select
+from sqlalchemy.sql import visitors
+
+from models.circuit import CircuitsTB
+from models.drivers import DriversTB
+from models.races import RacesTB
+from models.results import ResultsTB
+from models.standings import CircuitWinsTB, ConstructorStandingsTB, DriverStandingsTB
+
+
+def _tablas(*clauses):
+    """
+    Devuelve las tablas referenciadas por las columnas y condiciones dadas.
+    """
+    tablas = set()
+    for clause in clauses:
+        for element in visitors.iterate(clause):
+            if isinstance(getattr(element, "table", None), Table):
+                tablas.add(element.table)
+    return tablas
+
+
+def select_columns(*columns, where=()):
+    """
+    Construye un select de las columnas indicadas (de cualquiera de las cuatro
+    tablas) añadiendo solo los JOIN necesarios para resolverlas en una consulta.
+    Args:
+        columns: columnas o expresiones etiquetadas a proyectar.
+        where (tuple): condiciones de filtrado, que también pueden requerir JOIN.
+    """
+    tablas = _tablas(*columns, *where)
+    results_t, races_t = ResultsTB.__table__, RacesTB.__table__
+    drivers_t, circuits_t = DriversTB.__table__, CircuitsTB.__table__
+
+    stmt = select(*columns)
+    if results_t in tablas or (drivers_t in tablas and len(tablas) > 1):
+        # results es la tabla central: enlaza con races (y circuits a través de races) y con drivers
+        stmt = stmt.select_from(results_t)
+        if races_t in tablas or circuits_t in tablas:
+            stmt = stmt.join(races_t, ResultsTB.raceId == RacesTB.raceId)
+        if circuits_t in tablas:
+            stmt = stmt.join(circuits_t, RacesTB.circuitId == CircuitsTB.circuitId)
+        if drivers_t in tablas:
+            stmt = stmt.join(drivers_t, ResultsTB.driverId == DriversTB.driverId)
+        # Resultados borrados con RESULTS_SOFT_DELETE pendientes de purgar
+        stmt = stmt.where(ResultsTB.deletedAt.is_(None))
+    elif races_t in tablas and circuits_t in tablas:
+        stmt = stmt.select_from(races_t).join(circuits_t, RacesTB.circuitId == CircuitsTB.circuitId)
+    return stmt.where(*where)
+
+
+def circuit_ids():
+    """
+    Identificador y nombre de todos los circuitos.
+    """
+    return select_columns(
+        CircuitsTB.circuitId.label("id_circuito"),
+        CircuitsTB.name.label("nombre_circuito"),
+    )
+
+
+def last_n_winners(circuit_id, n):
+    """
+    Ganadores de las últimas n carreras disputadas en un circuito, con el piloto,
+    la carrera y el circuito resueltos en la misma consulta.
+    """
+    return select_columns(
+        DriversTB.forename.label("name"),
+        DriversTB.surname.label("surname"),
+        RacesTB.name.label("race"),
+        CircuitsTB.name.label("circuit"),
+        ResultsTB.time.label("time"),
+        RacesTB.date.label("date"),
+        where=(RacesTB.circuitId == circuit_id, ResultsTB.position == "1"),
+    ).order_by(RacesTB.date.desc()).limit(n)
+
+
+def driver_standings(season):
+    """
+    Clasificación de pilotos de una temporada, leída de la tabla de agregados.
+    """
+    return (
+        select(
+            DriverStandingsTB.driverId,
+            DriversTB.forename.label("name"),
+            DriversTB.surname.label("surname"),
+            DriverStandingsTB.points,
+            DriverStandingsTB.wins,
+        )
+        .join(DriversTB, DriverStandingsTB.driverId == DriversTB.driverId)
+        .where(DriverStandingsTB.season == season)
+        .order_by(DriverStandingsTB.points.desc(), DriverStandingsTB.wins.desc())
+    )
+
+
+def constructor_standings(season):
+    """
+    Clasificación de constructores de una temporada, leída de la tabla de agregados.
+    """
+    return (
+        select(ConstructorStandingsTB.constructorId, ConstructorStandingsTB.points, ConstructorStandingsTB.wins)
+        .where(ConstructorStandingsTB.season == season)
+        .order_by(ConstructorStandingsTB.points.desc(), ConstructorStandingsTB.wins.desc())
+    )
+
+
+def most_wins_in_circuit(circuit_id, n):
+    """
+    Los n pilotos con más victorias en un circuito, leídos de la tabla de agregados.
+    """
+    return (
+        select(
+            CircuitWinsTB.driverId,
+            DriversTB.forename.label("name"),
+            DriversTB.surname.label("surname"),
+            CircuitWinsTB.wins,
+        )
+        .join(DriversTB, CircuitWinsTB.driverId == DriversTB.driverId)
+        .where(CircuitWinsTB.circuitId == circuit_id)
+        .order_by(CircuitWinsTB.wins.desc(), CircuitWinsTB.driverId)
+        .limit(n)
+    )
+
+
+def with_positions(filas):
+    """
+    Añade a cada fila de una clasificación su posición (1, 2, ...).
+    """
+    return [{"position": posicion, **fila} for posicion, fila in enumerate(filas, start=1)]
+
+
+def list_results(after=None, limit=100, season=None, race_id=None, driver_id=None, constructor_id=None, position=None):
+    """
+    Página de resultados ordenada por resultId, con paginación por clave
+    (resultId > after) en lugar de OFFSET: cada página cuesta lo mismo sea
+    cual sea su profundidad. Se pide una fila de más para saber si hay otra página.
+    """
+    where = []
+    if season is not None:
+        where.append(RacesTB.year == season)
+    if race_id is not None:
+        where.append(ResultsTB.raceId == race_id)
+    if driver_id is not None:
+        where.append(ResultsTB.driverId == driver_id)
+    if constructor_id is not None:
+        where.append(ResultsTB.constructorId == constructor_id)
+    if position is not None:
+        where.append(ResultsTB.position == str(position))
+    if after is not None:
+        where.append(ResultsTB.resultId > after)
+    return select_columns(
+        *(columna for columna in ResultsTB.__table__.columns if columna.key not in ("idempotencyKey", "deletedAt")),
+        where=tuple(where),
+    ).order_by(ResultsTB.resultId).limit(limit + 1)
+
+
+def _huella(filtros):
+    return hashlib.sha1(json.dumps(filtros, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def encode_cursor(after, filtros):
+    """
+    Cursor opaco con el último resultId devuelto y una huella de los filtros.
+    """
+    datos = json.dumps({"after": after, "f": _huella(filtros)}).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip("=")
+
+
+def decode_cursor(cursor, filtros):
+    """
+    Devuelve el resultId del cursor. Lanza ValueError si el cursor no es válido
+    o se generó con otros filtros.
+    """
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after, huella = int(datos["after"]), datos["f"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor no válido: {e}")
+    if huella != _huella(filtros):
+        raise ValueError("El cursor se generó con otros filtros")
+    return after
+
+
+def paginate(filas, limit, filtros):
+    """
+    Recorta la fila de más que pide list_results y devuelve (filas, next_cursor),
+    con next_cursor None en la última página.
+    """
+    if len(filas) <= limit:
+        return filas, None
+    filas = filas[:limit]
+    return filas, encode_cursor(filas[-1]["resultId"], filtros)
+
+
+def as_dicts(rows):
+    """
+    Convierte las filas de un select con columnas etiquetadas en diccionarios.
+    """
+    return [row._asdict() for row in rows]
+
+
+# --- Contenido de las respuestas de los endpoints de lectura ---
+
+def _encontradas(filas, detalle):
+    """
+    Devuelve las filas o lanza 404 con el detalle si no hay ninguna.
+    """
+    if not filas:
+        raise HTTPException(status_code=404, detail=detalle)
+    return filas
+
+
+def contenido_circuit_ids(db):
+    filas = _encontradas(as_dicts(db.execute(circuit_ids())), "No circuit IDs found")
+    return {
+        "msg": "Circuit IDs",
+        "circuit_ids": filas
+    }
+
+
+def contenido_last_n_winners(db, circuit_id, n):
+    winners = _encontradas(as_dicts(db.execute(last_n_winners(circuit_id, n))), "No winners found for this circuit")
+    return {
+        "msg": f"Last {n} winners at circuit {circuit_id}",
+        "winners": winners
+    }
+
+
+def contenido_most_wins(db, circuit_id, n):
+    winners = _encontradas(as_dicts(db.execute(most_wins_in_circuit(circuit_id, n))), "No winners found for this circuit")
+    return {
+        "msg": f"Top {n} winners at circuit {circuit_id}",
+        "winners": with_positions(winners)
+    }
+
+
+def contenido_driver_standings(db, season):
+    standings = _encontradas(as_dicts(db.execute(driver_standings(season))), "No standings found for this season")
+    return {
+        "msg": f"Driver standings {season}",
+        "standings": with_positions(standings)
+    }
+
+
+def contenido_constructor_standings(db, season):
+    standings = _encontradas(as_dicts(db.execute(constructor_standings(season))), "No standings found for this season")
+    return {
+        "msg": f"Constructor standings {season}",
+        "standings": with_positions(standings)
+    }
+
+
+def contenido_results(db, filtros, limit, cursor=None):
+    """
+    Página de GET /results. filtros tiene las claves season, raceId, driverId,
+    constructorId y position. Lanza 400 si el cursor no es válido.
+    """
+    try:
+        after = decode_cursor(cursor, filtros) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stmt = list_results(after, limit, filtros["season"], filtros["raceId"], filtros["driverId"],
+                        filtros["constructorId"], filtros["position"])
+    filas, next_cursor = paginate(as_dicts(db.execute(stmt)), limit, filtros)
+    return {
+        "msg": f"{len(filas)} resultados",
+        "results": filas,
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,78 @@
+"""
+Enrutado de las lecturas a las réplicas de DATABASE_REPLICA_URLS.
+
+ReplicaMiddleware marca como de solo lectura las peticiones GET y HEAD, y
+database.get_db (y la exportación) abre entonces una ReplicaSession, que en
+su primera consulta conecta con una réplica elegida por turnos o por la que
+menos conexiones tiene en uso (DB_REPLICA_STRATEGY). Una respuesta cacheada
+no llega a conectar con ninguna. Si la réplica no responde se prueba la siguiente y, si ninguna responde, el primario;
+la réplica que falla no se vuelve a usar durante DB_REPLICA_RETRY_SECONDS.
+Las escrituras (POST, DELETE...) van siempre al primario.
+
+Lee tus escrituras: una réplica puede ir por detrás del primario, así que
+tras una escritura correcta la respuesta lleva la cookie db_primary_until y
+las lecturas de ese cliente van al primario durante DB_READ_YOUR_WRITES_SECONDS.
+La cookie sirve con varios workers y la guardan los clientes de client.py.
+Las respuestas cacheadas (cache.py) que se generen con una réplica retrasada
+pueden conservar datos anteriores a la escritura hasta su TTL.
+"""
+
+import math
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+
+from database import DB_READ_YOUR_WRITES_SECONDS, read_only
+
+
+COOKIE = "db_primary_until"
+METODOS_LECTURA = ("GET", "HEAD", "OPTIONS")
+
+
+def _reciente(scope):
+    """
+    Indica si el cliente ha escrito hace menos de DB_READ_YOUR_WRITES_SECONDS.
+    """
+    for nombre, valor in scope["headers"]:
+        if nombre == b"cookie":
+            hasta = cookie_parser(valor.decode("latin-1")).get(COOKIE)
+            try:
+                return hasta is not None and float(hasta) > time.time()
+            except ValueError:
+                return False
+    return False
+
+
+def _cookie():
+    hasta = time.time() + DB_READ_YOUR_WRITES_SECONDS
+    return f"{COOKIE}={hasta:.3f}; Max-Age={math.ceil(DB_READ_YOUR_WRITES_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+
+
+class ReplicaMiddleware:
+    """
+    Middleware ASGI que envía las lecturas a las réplicas y mantiene en el
+    primario las lecturas de un cliente que acaba de escribir.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        lectura = scope["method"] in METODOS_LECTURA
+        token = read_only.set(lectura and not _reciente(scope))
+        fijar = not lectura and DB_READ_YOUR_WRITES_SECONDS > 0
+
+        async def enviar(mensaje):
+            if fijar and mensaje["type"] == "http.response.start" and mensaje["status"] < 400:
+                MutableHeaders(scope=mensaje).append("Set-Cookie", _cookie())
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            read_only.reset(token)
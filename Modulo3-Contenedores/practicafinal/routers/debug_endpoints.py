@@ -0,0 +1,75 @@
+"""
+Rutas de depuración: perfiles de CPU del worker que atiende la petición.
+Solo están disponibles si se define DEBUG_TOKEN y exigen la cabecera
+X-Debug-Token (ver profiling.py).
+"""
+
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+import profiling
+from responses import json_response
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(profiling.requerir_admin)], include_in_schema=False)
+
+# Endpoint para obtener un perfil por muestreo de todos los hilos del worker
+@router.get("/profile")
+async def sampling_profile(
+    seconds: float = Query(10, gt=0, le=60, description="Duración del perfil"),
+    formato: str = Query("speedscope", alias="format", description="speedscope o collapsed"),
+    interval_ms: float = Query(5, ge=1, le=100, description="Milisegundos entre muestras"),
+):
+    """
+    Toma muestras de la pila de todos los hilos durante seconds segundos y
+    las devuelve en formato speedscope (JSON) o de pilas colapsadas (texto).
+    El muestreo corre en un hilo aparte, así que el worker sigue atendiendo peticiones.
+    """
+    if formato not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+    logger.info(f"Perfil por muestreo de {seconds} s cada {interval_ms} ms")
+    try:
+        pilas = await asyncio.to_thread(profiling.muestrear, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if formato == "collapsed":
+        return Response(
+            profiling.colapsadas(pilas),
+            media_type="text/plain",
+            headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+        )
+    return json_response(
+        profiling.speedscope(pilas, interval_ms / 1000, f"formulaUnoBackend {seconds} s"),
+        headers={"Content-Disposition": 'attachment; filename="profile.speedscope.json"'},
+    )
+
+# Endpoint para descargar el perfil cProfile de una petición
+@router.get("/profile/requests/{profile_id}")
+def request_profile(
+    profile_id: str,
+    formato: str = Query("text", alias="format", description="text o pstats"),
+    sort: str = Query("cumulative", description="Orden de pstats en formato text"),
+):
+    """
+    Devuelve el perfil de una petición enviada con X-Profile: 1, como texto de
+    pstats o como fichero binario de pstats (snakeviz, pstats.Stats).
+    """
+    profile = profiling.perfiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if formato == "pstats":
+        return Response(
+            profiling.volcado(profile),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+    if formato != "text":
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato}")
+    try:
+        return Response(profiling.informe(profile, sort), media_type="text/plain")
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Orden no soportado: {sort}")
@@ -0,0 +1,150 @@
+import logging
+from functools import partial
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, Header, Query, Request
+from sqlalchemy.orm import Session
+
+import crud
+import export
+import queries
+from cache import response_cache
+from database import get_db
+from models import results
+from profiling import PerfilRoute
+from responses import json_response
+
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=PerfilRoute)
+
+# Endpoint para obtener los identificadores y nombres de los circuitos
+@router.get("/circuit_ids")
+def circuits_id(request: Request, db: Session = Depends(get_db)):
+    """
+    Devuelve una lista de diccionarios con el id y nombre de cada circuito.
+    La respuesta se cachea y admite If-None-Match (ver cache.py).
+    """
+    return response_cache.responder(request, "circuit_ids", partial(queries.contenido_circuit_ids, db))
+
+# Endpoint para consultar los últimos n ganadores en un circuito específico
+@router.get("/last_n_winners_in_circuit/{circuit_id}/{n}")
+def last_n_winners_circuit(circuit_id: int, n: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Devuelve los últimos n ganadores en un circuito dado.
+    La respuesta se cachea hasta que se escriben resultados.
+    """
+    return response_cache.responder(request, "last_n_winners", partial(queries.contenido_last_n_winners, db, circuit_id, n))
+
+# Endpoint para consultar los pilotos con más victorias en un circuito
+@router.get("/most_wins_in_circuit/{circuit_id}/{n}")
+def most_wins_circuit(circuit_id: int, n: int, db: Session = Depends(get_db)):
+    """
+    Devuelve los n pilotos con más victorias en un circuito dado.
+    """
+    return json_response(queries.contenido_most_wins(db, circuit_id, n))
+
+# Endpoint para consultar la clasificación de pilotos de una temporada
+@router.get("/standings/drivers/{season}")
+def driver_standings(season: int, db: Session = Depends(get_db)):
+    """
+    Devuelve la clasificación de pilotos de la temporada, de más a menos puntos.
+    """
+    return json_response(queries.contenido_driver_standings(db, season))
+
+# Endpoint para consultar la clasificación de constructores de una temporada
+@router.get("/standings/constructors/{season}")
+def constructor_standings(season: int, db: Session = Depends(get_db)):
+    """
+    Devuelve la clasificación de constructores de la temporada, de más a menos puntos.
+    """
+    return json_response(queries.contenido_constructor_standings(db, season))
+
+# Endpoint para listar resultados con filtros y paginación por cursor
+@router.get("/results")
+def list_results(
+    season: Optional[int] = Query(None, description="Año de la temporada"),
+    race_id: Optional[int] = Query(None, alias="raceId"),
+    driver_id: Optional[int] = Query(None, alias="driverId"),
+    constructor_id: Optional[int] = Query(None, alias="constructorId"),
+    position: Optional[int] = Query(None, ge=1),
+    limit: int = Query(100, ge=1, le=1000, description="Resultados por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    db: Session = Depends(get_db),
+):
+    """
+    Devuelve una página de resultados ordenados por resultId y el cursor de la
+    página siguiente (null en la última). El cursor solo es válido con los mismos filtros.
+    """
+    filtros = {"season": season, "raceId": race_id, "driverId": driver_id,
+               "constructorId": constructor_id, "position": position}
+    return json_response(queries.contenido_results(db, filtros, limit, cursor))
+
+# Endpoint para crear (o, con upsert, crear o corregir) un resultado de carrera
+@router.post("/results/", response_model=results.Result)
+def create_result(
+    result: results.Result = Body(...),
+    upsert: bool = Query(False, description="Crea o actualiza el resultado de la misma carrera y piloto"),
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=crud.IDEMPOTENCY_KEY_MAX),
+    db: Session = Depends(get_db),
+):
+    """
+    Crea un nuevo resultado de carrera en la base de datos.
+    Devuelve 400 si la carrera, el piloto, el constructor o el estado no existen.
+    Con upsert=true, o con la cabecera Idempotency-Key, crea el resultado o
+    actualiza el que se cargó antes con la misma clave (ver crud.upsert_results),
+    así que la petición se puede repetir; la cabecera Idempotency-Status indica
+    si se ha creado, actualizado o no ha cambiado.
+    """
+    return crud.escribir(db, crud.crear_resultado, result, upsert, idempotency_key)
+
+# Endpoint para crear varios resultados de carrera en una sola transacción
+@router.post("/results/bulk")
+def create_results_bulk(
+    items: list = Depends(crud.leer_lote_resultados),
+    upsert: bool = Query(False, description="Crea o actualiza los resultados de la misma carrera y piloto"),
+    idempotency_key: Optional[str] = Header(None, min_length=1, max_length=crud.IDEMPOTENCY_KEY_MAX),
+    db: Session = Depends(get_db),
+):
+    """
+    Crea un lote de resultados (array JSON o NDJSON) con un único INSERT multifila.
+    Devuelve el estado de cada elemento: creado con su resultId o inválido con sus errores.
+    Con upsert=true o Idempotency-Key carga el lote con un único upsert y el
+    estado de cada elemento es created, updated o unchanged: repetir un lote
+    ya cargado no escribe nada.
+    """
+    return crud.escribir(db, crud.crear_lote, items, upsert, idempotency_key)
+
+# Endpoint para exportar una tabla completa en streaming
+@router.get("/export/{tabla}")
+def export_table(
+    tabla: str,
+    formato: str = Query("ndjson", alias="format", description="ndjson, csv, arrow o parquet"),
+    columns: Optional[str] = Query(None, description="Columnas separadas por comas (todas por defecto)"),
+    season: Optional[int] = Query(None, description="Solo las filas de una temporada"),
+):
+    """
+    Devuelve las filas de la tabla en NDJSON, CSV, Arrow IPC o Parquet, enviadas
+    por bloques a medida que se leen de la base de datos.
+    """
+    return export.respuesta(tabla, formato, columns, season)
+
+# Endpoint para eliminar varios resultados de carrera en una sola sentencia
+@router.delete("/results/bulk")
+def delete_results_bulk(peticion: results.ResultsDelete = Body(...), db: Session = Depends(get_db)):
+    """
+    Elimina los resultados de una lista de resultId o todos los de una carrera
+    (raceId) con un único DELETE ... RETURNING (ver crud.delete_results).
+    Devuelve los resultId eliminados; los que no existen se ignoran.
+    """
+    return crud.escribir(db, crud.eliminar_lote, peticion)
+
+# Endpoint para eliminar un resultado de carrera por su ID
+@router.delete("/results/{result_id}")
+def delete_result(result_id: int, db: Session = Depends(get_db)):
+    """
+    Elimina un resultado de carrera de la base de datos por su identificador,
+    con un único DELETE ... RETURNING.
+    """
+    return crud.escribir(db, crud.eliminar_resultado, result_id)
@@ -0,0 +1,121 @@
+"""
+Carga inicial de la base de datos de Fórmula 1 con COPY.
+
+Los datos de dbformula1_bueno/02_data.sql están en formato COPY ... FROM stdin
+(un bloque por tabla), que Postgres carga mucho más rápido que miles de INSERT
+individuales. El contenedor de Postgres ejecuta los scripts de
+dbformula1_bueno en orden: primero las tablas (01_tables.sql), luego los datos
+(02_data.sql, con el tiempo de cada tabla en el log) y por último las claves e
+índices (03_schema.sql), que se crean cuando los datos ya están cargados.
+
+Uso:
+    python seed.py dump   # regenera 02_data.sql a partir de DATABASE_URL
+    python seed.py load   # carga tablas, datos y esquema en DATABASE_URL
+"""
+
+import argparse
+import io
+import logging
+import time
+from pathlib import Path
+
+from database import engine
+from migrate import migrate
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+SEED_DIR = Path(__file__).parent / "dbformula1_bueno"
+TABLES_SQL = SEED_DIR / "01_tables.sql"
+DATA_SQL = SEED_DIR / "02_data.sql"
+
+# Tablas en orden de carga y columna por la que se ordenan sus filas
+TABLAS = {
+    "circuits": "circuitId",
+    "drivers": "driverId",
+    "races": "raceId",
+    "results": "resultId",
+}
+
+
+def _copy_header(tabla, columnas):
+    lista = ", ".join(f'"{columna}"' for columna in columnas)
+    return f"COPY public.{tabla} ({lista}) FROM stdin;"
+
+
+def dump(bind=engine, destino=DATA_SQL):
+    """
+    Exporta las tablas de la base de datos en formato COPY a un script de psql.
+    """
+    conn = bind.raw_connection()
+    try:
+        with conn.cursor() as cursor, open(destino, "w", encoding="utf-8") as out:
+            out.write("--\n-- Datos de la base de datos de Fórmula 1 en formato COPY.\n")
+            out.write("-- Generado con `python seed.py dump`.\n--\n\n")
+            out.write("SET client_encoding = 'UTF8';\n\\timing on\n")
+            for tabla, orden in TABLAS.items():
+                cursor.execute(f"SELECT * FROM public.{tabla} LIMIT 0")
+                columnas = [desc[0] for desc in cursor.description]
+                out.write(f"\n\\echo 'Cargando {tabla}'\n{_copy_header(tabla, columnas)}\n")
+                cursor.copy_expert(f'COPY (SELECT * FROM public.{tabla} ORDER BY "{orden}") TO STDOUT', out)
+                out.write("\\.\n")
+                logger.info(f"Exportada la tabla {tabla}")
+    finally:
+        conn.close()
+
+
+def _bloques_copy(origen=DATA_SQL):
+    """
+    Recorre 02_data.sql devolviendo (tabla, sentencia COPY, datos) por cada bloque.
+    """
+    tabla = cabecera = None
+    datos = []
+    with open(origen, encoding="utf-8") as f:
+        for linea in f:
+            if cabecera is None:
+                if linea.startswith("COPY public."):
+                    cabecera = linea.strip()
+                    tabla = cabecera.split()[1].split(".")[1]
+            elif linea == "\\.\n":
+                yield tabla, cabecera, "".join(datos)
+                tabla = cabecera = None
+                datos = []
+            else:
+                datos.append(linea)
+
+
+def load(bind=engine):
+    """
+    Crea las tablas, carga los datos con COPY midiendo el tiempo de cada tabla y
+    aplica después las claves e índices.
+    """
+    inicio = time.perf_counter()
+    conn = bind.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(TABLES_SQL.read_text(encoding="utf-8"))
+            for tabla, cabecera, datos in _bloques_copy():
+                t0 = time.perf_counter()
+                cursor.copy_expert(cabecera.rstrip(";"), io.StringIO(datos))
+                logger.info(f"{tabla}: {cursor.rowcount} filas en {time.perf_counter() - t0:.3f} s")
+        conn.commit()
+    finally:
+        conn.close()
+    t0 = time.perf_counter()
+    migrate(bind)
+    logger.info(f"Claves e índices creados en {time.perf_counter() - t0:.3f} s")
+    logger.info(f"Carga completa en {time.perf_counter() - inicio:.3f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga inicial de la base de datos de Fórmula 1 con COPY")
+    parser.add_argument("accion", choices=["dump", "load"])
+    args = parser.parse_args()
+    if args.accion == "dump":
+        dump()
+    else:
+        load()
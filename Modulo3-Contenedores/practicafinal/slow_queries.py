@@ -0,0 +1,149 @@
+"""
+Registro de consultas lentas con su plan de ejecución.
+
+Las consultas que tardan más de SLOW_QUERY_MS milisegundos se registran con
+logger.warning junto con sus parámetros y la ruta de la petición que las lanzó
+(ver metrics.ruta_actual). A una muestra de ellas se le añade su plan:
+    Postgres: EXPLAIN (ANALYZE, BUFFERS) en las SELECT, que vuelve a
+    ejecutar la consulta, y EXPLAIN sin ANALYZE en el resto para no repetir
+    escrituras. Se ejecuta dentro de un SAVEPOINT para que un fallo del
+    EXPLAIN no aborte la transacción de la petición.
+    SQLite: EXPLAIN QUERY PLAN.
+Así se ve enseguida qué consultas recorren una tabla entera por falta de índice.
+
+Para acotar el coste solo se obtiene el plan de una fracción
+SLOW_QUERY_EXPLAIN_SAMPLE de las consultas lentas, como mucho una vez cada
+SLOW_QUERY_EXPLAIN_INTERVAL segundos por sentencia, y nunca de las consultas
+con cursor de servidor (exportaciones) ni de las executemany.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+from sqlalchemy import event
+
+from metrics import ruta_actual
+
+
+logger = logging.getLogger(__name__)
+
+# Umbral en milisegundos (0 = desactivado)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Fracción de las consultas lentas de las que se obtiene el plan
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+# Segundos mínimos entre dos planes de la misma sentencia
+SLOW_QUERY_EXPLAIN_INTERVAL = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60"))
+
+# Caracteres máximos de los parámetros en el log (los lotes pueden ser enormes)
+MAX_PARAMETROS = 1000
+# Sentencias distintas recordadas para el intervalo entre planes
+MAX_SENTENCIAS = 1000
+
+
+class _Muestreo:
+    """
+    Decide si se obtiene el plan de una consulta lenta.
+    """
+
+    def __init__(self, fraccion, intervalo):
+        self.fraccion = fraccion
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._ultimos = {}
+
+    def elegir(self, statement):
+        if random.random() >= self.fraccion:
+            return False
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora - self._ultimos.get(statement, float("-inf")) < self.intervalo:
+                return False
+            if len(self._ultimos) >= MAX_SENTENCIAS:
+                self._ultimos.clear()
+            self._ultimos[statement] = ahora
+        return True
+
+
+muestreo = _Muestreo(SLOW_QUERY_EXPLAIN_SAMPLE, SLOW_QUERY_EXPLAIN_INTERVAL)
+
+
+def _parametros(parameters):
+    texto = repr(parameters)
+    if len(texto) > MAX_PARAMETROS:
+        return texto[:MAX_PARAMETROS] + f"... ({len(texto)} caracteres)"
+    return texto
+
+
+def explain(conn, statement, parameters):
+    """
+    Devuelve el plan de la sentencia como texto, o None si el dialecto no lo admite.
+    Usa un cursor de la conexión DBAPI, así que no dispara los eventos de SQLAlchemy.
+    """
+    dialecto = conn.dialect.name
+    if dialecto == "postgresql":
+        es_select = statement.lstrip().upper().startswith("SELECT")
+        prefijo = "EXPLAIN (ANALYZE, BUFFERS) " if es_select else "EXPLAIN "
+    elif dialecto == "sqlite":
+        prefijo = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    cursor = conn.connection.cursor()
+    try:
+        if dialecto == "postgresql":
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefijo + statement, parameters)
+            filas = cursor.fetchall()
+        except Exception:
+            if dialecto == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        if dialecto == "postgresql":
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        cursor.close()
+
+    if dialecto == "sqlite":
+        # (id, parent, notused, detail)
+        return "\n".join(fila[3] for fila in filas)
+    return "\n".join(fila[0] for fila in filas)
+
+
+# --- Eventos de SQLAlchemy ---
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    context._slow_inicio = time.perf_counter()
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    milisegundos = (time.perf_counter() - context._slow_inicio) * 1000
+    if milisegundos < SLOW_QUERY_MS:
+        return
+    ruta = ruta_actual() or "fuera de una petición"
+    mensaje = f"Consulta lenta ({milisegundos:.1f} ms) en {ruta}: {statement} -- parámetros: {_parametros(parameters)}"
+    streaming = context.execution_options.get("stream_results") or context.execution_options.get("yield_per")
+    if executemany or streaming or not muestreo.elegir(statement):
+        logger.warning(mensaje)
+        return
+    try:
+        plan = explain(conn, statement, parameters)
+    except Exception as e:
+        logger.warning(mensaje)
+        logger.error(f"Error al obtener el plan de la consulta lenta: {e}")
+        return
+    logger.warning(f"{mensaje}\nPlan:\n{plan}" if plan else mensaje)
+
+
+def instrumentar(engine):
+    """
+    Registra las consultas lentas de un engine síncrono (o el sync_engine de uno asíncrono).
+    """
+    if event.contains(engine, "after_cursor_execute", _despues_de_consulta):
+        # create_app() puede llamarse más de una vez sobre los mismos engines
+        return
+    event.listen(engine, "before_cursor_execute", _antes_de_consulta)
+    event.listen(engine, "after_cursor_execute", _despues_de_consulta)
@@ -0,0 +1,71 @@
+"""
+Configuración de las pruebas: una base de datos SQLite temporal con unas pocas
+carreras, pilotos y un resultado, que se vuelve a crear para cada prueba.
+
+database.py lee la configuración al importarse, así que las variables se
+fijan aquí antes de importar la API. DB_MODE se respeta si viene del entorno
+(DB_MODE=async python -m pytest prueba los endpoints asíncronos).
+"""
+
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='f1-tests-')}/f1.sqlite"
+os.environ.setdefault("DB_MODE", "sync")
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["CACHE_REDIS_URL"] = ""
+os.environ["CACHE_ENABLED"] = "false"
+os.environ["DB_INIT_ON_STARTUP"] = "false"
+os.environ["RESULTS_SOFT_DELETE"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import aggregates
+from database import engine
+from models.basemodel import Base
+from models.circuit import CircuitsTB
+from models.drivers import DriversTB
+from models.races import RacesTB
+from models.results import ResultsTB
+
+
+@pytest.fixture
+def db_engine():
+    """
+    Engine de la base de datos de pruebas con el esquema recién creado: el
+    circuito 1, las carreras 1 y 2 de 2023, los pilotos 1, 2 y 3 y un
+    resultado (carrera 1, piloto 3, constructor 1, estado 1) que da por
+    existentes el constructor y el estado.
+    """
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(CircuitsTB), [{"circuitId": 1, "circuitRef": "monza", "name": "Monza"}])
+        conn.execute(insert(RacesTB), [
+            {"raceId": race_id, "year": 2023, "round": race_id, "circuitId": 1,
+             "name": f"Carrera {race_id}", "date": datetime(2023, 3, race_id)}
+            for race_id in (1, 2)
+        ])
+        conn.execute(insert(DriversTB), [
+            {"driverId": driver_id, "driverRef": f"piloto{driver_id}", "forename": "Piloto", "surname": str(driver_id)}
+            for driver_id in (1, 2, 3)
+        ])
+        conn.execute(insert(ResultsTB), [{
+            "raceId": 1, "driverId": 3, "constructorId": 1, "statusId": 1, "position": 1, "points": 25,
+            "idempotencyKey": "race:1:driver:3",
+        }])
+        aggregates.rebuild(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def client(db_engine):
+    import formulaUnoBackend
+    with TestClient(formulaUnoBackend.create_app()) as cliente:
+        yield cliente
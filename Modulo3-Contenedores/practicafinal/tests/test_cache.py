@@ -0,0 +1,165 @@
+"""
+Pruebas de la caché de respuestas con el backend de Redis sobre fakeredis:
+coalescencia de los fallos entre hilos, tareas y workers, invalidación
+compartida después de una escritura y respuestas 304 con If-None-Match.
+
+Cada worker es un ResponseCache con su propio cliente del mismo servidor de
+fakeredis, como varios procesos de uvicorn con el mismo CACHE_REDIS_URL.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import Request
+from sqlalchemy import select
+
+import cache
+import crud
+from database import SessionLocal
+from models.results import Result, ResultsTB
+
+
+fakeredis = pytest.importorskip("fakeredis")
+
+N = 8
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    return fakeredis.FakeServer()
+
+
+def worker(servidor):
+    respuestas = cache.ResponseCache(
+        lambda nombre, maxsize: cache.RedisBackend(nombre, maxsize, cliente=fakeredis.FakeRedis(server=servidor))
+    )
+    respuestas.registrar("last_n_winners", ttl=60, tablas=("results",))
+    return respuestas
+
+
+def peticion(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({
+        "type": "http", "method": "GET", "scheme": "http", "server": ("testserver", 80),
+        "path": "/last_n_winners_in_circuit/1/3", "query_string": b"", "headers": headers,
+    })
+
+
+class Contador:
+    """
+    producir() que tarda en responder y cuenta cuántas veces se llama.
+    """
+
+    def __init__(self, espera=0.2):
+        self.espera = espera
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def _contar(self):
+        with self._lock:
+            self.llamadas += 1
+            return {"llamada": self.llamadas}
+
+    def __call__(self):
+        time.sleep(self.espera)
+        return self._contar()
+
+    async def asincrono(self):
+        await asyncio.sleep(self.espera)
+        return self._contar()
+
+
+def test_fakeredis_desde_cache_redis_url(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "CACHE_REDIS_URL", "fakeredis://")
+    monkeypatch.setattr(cache, "_redis_client", None)
+    respuestas = cache.ResponseCache(cache.default_backend())
+    endpoint = respuestas.registrar("last_n_winners", ttl=60, tablas=("results",))
+    assert isinstance(endpoint.backend, cache.RedisBackend)
+    assert isinstance(endpoint.backend.cliente, fakeredis.FakeRedis)
+
+    producir = Contador(espera=0)
+    estados = [respuestas.responder(peticion(), "last_n_winners", producir).headers["X-Cache"] for _ in range(2)]
+    assert estados == ["MISS", "HIT"] and producir.llamadas == 1
+
+
+def test_fallos_simultaneos_generan_una_sola_respuesta(servidor):
+    workers = [worker(servidor), worker(servidor)]
+    producir = Contador()
+    barrera = threading.Barrier(N)
+    respuestas = [None] * N
+
+    def pedir(i):
+        barrera.wait()
+        respuestas[i] = workers[i % 2].responder(peticion(), "last_n_winners", producir)
+
+    hilos = [threading.Thread(target=pedir, args=(i,)) for i in range(N)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert producir.llamadas == 1
+    assert {respuesta.body for respuesta in respuestas} == {b'{"llamada":1}'}
+    assert sorted(respuesta.headers["X-Cache"] for respuesta in respuestas) == ["HIT"] * (N - 1) + ["MISS"]
+
+
+def test_fallos_simultaneos_generan_una_sola_respuesta_async(servidor):
+    workers = [worker(servidor), worker(servidor)]
+    producir = Contador()
+
+    async def pedir_todas():
+        return await asyncio.gather(*[
+            workers[i % 2].responder_async(peticion(), "last_n_winners", producir.asincrono) for i in range(N)
+        ])
+
+    respuestas = asyncio.run(pedir_todas())
+    assert producir.llamadas == 1
+    assert {respuesta.body for respuesta in respuestas} == {b'{"llamada":1}'}
+
+
+def test_una_escritura_invalida_la_cache_de_todos_los_workers(servidor, db_engine, monkeypatch):
+    escribe, lee = worker(servidor), worker(servidor)
+    producir = Contador(espera=0)
+    assert lee.responder(peticion(), "last_n_winners", producir).headers["X-Cache"] == "MISS"
+    assert lee.responder(peticion(), "last_n_winners", producir).headers["X-Cache"] == "HIT"
+
+    monkeypatch.setattr(crud, "response_cache", escribe)
+    result = Result(raceId=2, driverId=1, constructorId=1, statusId=1, points=25)
+    with SessionLocal() as db:
+        crud.escribir(db, crud.crear_resultado, result)
+        assert db.scalar(select(ResultsTB.resultId).where(ResultsTB.raceId == 2)) is not None
+
+    respuesta = lee.responder(peticion(), "last_n_winners", producir)
+    assert respuesta.headers["X-Cache"] == "MISS"
+    assert respuesta.body == b'{"llamada":2}'
+
+
+def test_una_escritura_sin_cambios_no_invalida(servidor, db_engine, monkeypatch):
+    escribe, lee = worker(servidor), worker(servidor)
+    producir = Contador(espera=0)
+    monkeypatch.setattr(crud, "response_cache", escribe)
+    result = Result(raceId=1, driverId=3, constructorId=1, statusId=1, position=1, points=25)
+
+    lee.responder(peticion(), "last_n_winners", producir)
+    with SessionLocal() as db:
+        crud.escribir(db, crud.crear_resultado, result, True)
+    assert lee.responder(peticion(), "last_n_winners", producir).headers["X-Cache"] == "HIT"
+
+
+def test_etag_coincidente_devuelve_304(servidor):
+    respuestas = worker(servidor)
+    producir = Contador(espera=0)
+    primera = respuestas.responder(peticion(), "last_n_winners", producir)
+    etag = primera.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"otro", {etag}'):
+        respuesta = respuestas.responder(peticion(if_none_match), "last_n_winners", producir)
+        assert respuesta.status_code == 304
+        assert respuesta.body == b"" and respuesta.headers["ETag"] == etag
+    assert respuestas.responder(peticion('"otro"'), "last_n_winners", producir).status_code == 200
+    assert producir.llamadas == 1
+    assert respuestas.stats()["last_n_winners"]["not_modified"] == 3
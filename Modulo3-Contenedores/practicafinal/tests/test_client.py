@@ -0,0 +1,86 @@
+"""
+Pruebas de los reintentos de client.py contra una API simulada con
+httpx.MockTransport: qué códigos se reintentan en cada método y borrados
+reintentados que reciben 404 porque el intento anterior ya borró el resultado.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from client import AsyncFormulaUnoClient, FormulaUnoClient, FormulaUnoError
+
+
+RESULTADO = {"raceId": 2, "driverId": 1, "constructorId": 1, "statusId": 1, "position": 1, "points": 25}
+
+
+class Api:
+    """
+    Responde a cada petición con el siguiente paso de la lista: un código de
+    estado o una excepción de httpx. Guarda las peticiones recibidas.
+    """
+
+    def __init__(self, *pasos):
+        self.pasos = list(pasos)
+        self.peticiones = []
+
+    def __call__(self, peticion):
+        self.peticiones.append(peticion)
+        paso = self.pasos.pop(0)
+        if isinstance(paso, type) and issubclass(paso, Exception):
+            raise paso("simulado", request=peticion)
+        return httpx.Response(paso, json={"resultId": 1, "resultIds": [1], "detail": "simulado"})
+
+
+def cliente(api):
+    client = FormulaUnoClient("http://api", backoff=0)
+    client._http = httpx.Client(base_url="http://api", transport=httpx.MockTransport(api))
+    return client
+
+
+@pytest.mark.parametrize("pasos", [(502, 404), (504, 404), (httpx.ReadTimeout, 404), (503, 502, 404)])
+def test_borrado_reintentado_con_404_se_da_por_hecho(pasos):
+    api = Api(*pasos)
+    assert cliente(api).eliminar_resultado(1) is None
+    assert len(api.peticiones) == len(pasos)
+
+
+@pytest.mark.parametrize("pasos", [(404,), (503, 404), (httpx.ConnectError, 404)])
+def test_borrado_de_un_resultado_que_no_existia_devuelve_404(pasos):
+    # Ningún intento anterior ha podido llegar a borrarlo
+    with pytest.raises(FormulaUnoError) as error:
+        cliente(Api(*pasos)).eliminar_resultado(1)
+    assert error.value.status_code == 404
+
+
+def test_lectura_con_404_tras_un_reintento_no_se_da_por_buena():
+    with pytest.raises(FormulaUnoError) as error:
+        cliente(Api(502, 404)).obtener_circuitos()
+    assert error.value.status_code == 404
+
+
+def test_solo_el_upsert_reintenta_el_409():
+    api = Api(409, 200)
+    assert cliente(api).crear_resultado(RESULTADO, upsert=True)["resultId"] == 1
+    assert len(api.peticiones) == 2
+    assert api.peticiones[0].url.params["upsert"] == "true"
+
+    for llamar in (lambda c: c.crear_resultado(RESULTADO), lambda c: c.obtener_circuitos(),
+                   lambda c: c.eliminar_resultado(1)):
+        api = Api(409, 200)
+        with pytest.raises(FormulaUnoError) as error:
+            llamar(cliente(api))
+        assert error.value.status_code == 409 and len(api.peticiones) == 1
+
+
+def test_borrado_reintentado_con_404_async():
+    async def eliminar(api):
+        client = AsyncFormulaUnoClient("http://api", backoff=0)
+        client._http = httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(api))
+        async with client:
+            return await client.eliminar_resultado(1)
+
+    assert asyncio.run(eliminar(Api(502, 404))) is None
+    with pytest.raises(FormulaUnoError):
+        asyncio.run(eliminar(Api(409, 200)))
@@ -0,0 +1,34 @@
+"""
+Pruebas de GET /export/{tabla}: exportación de results en NDJSON y 500 sin el
+texto del error si falla la lectura del primer bloque.
+"""
+
+import json
+import logging
+
+import export
+
+
+def test_exporta_results_en_ndjson(client):
+    respuesta = client.get("/export/results", params={"columns": "raceId,driverId,points"})
+    assert respuesta.status_code == 200
+    assert [json.loads(linea) for linea in respuesta.text.splitlines()] == [{"raceId": 1, "driverId": 3, "points": 25}]
+
+
+def test_error_al_leer_devuelve_500_generico(client, monkeypatch, caplog):
+    def fallar(*args, **kwargs):
+        raise RuntimeError("could not connect to server at 10.0.0.5 as user f1admin")
+        yield
+
+    async def fallar_async(*args, **kwargs):
+        raise RuntimeError("could not connect to server at 10.0.0.5 as user f1admin")
+        yield
+
+    monkeypatch.setattr(export, "stream_tabla", fallar)
+    monkeypatch.setattr(export, "stream_tabla_async", fallar_async)
+    with caplog.at_level(logging.ERROR, logger="export"):
+        respuesta = client.get("/export/results")
+    assert respuesta.status_code == 500
+    assert respuesta.json()["detail"] == "Error al exportar results"
+    registro, = [r for r in caplog.records if r.name == "export"]
+    assert "10.0.0.5" in str(registro.exc_info[1])
@@ -0,0 +1,107 @@
+"""
+Pruebas de la paginación por clave de GET /results: recorrido completo sin
+duplicados ni huecos, next_cursor nulo en la última página y 400 con un cursor
+mal formado o generado con otros filtros.
+"""
+
+import base64
+import json
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from models.results import ResultsTB
+
+
+@pytest.fixture
+def resultados(db_engine):
+    """
+    Añade 23 resultados al de conftest (24 en total: 12 de cada carrera) y
+    devuelve sus resultId en orden.
+    """
+    with db_engine.begin() as conn:
+        conn.execute(insert(ResultsTB), [
+            {"raceId": 1 + i % 2, "driverId": 1 + i % 3, "constructorId": 1, "statusId": 1, "points": i}
+            for i in range(1, 24)
+        ])
+        return list(conn.scalars(select(ResultsTB.resultId).order_by(ResultsTB.resultId)))
+
+
+def recorrer(client, limit, **filtros):
+    """
+    Pide páginas hasta que next_cursor es nulo. Devuelve las páginas (listas de resultId).
+    """
+    paginas, cursor = [], None
+    while True:
+        params = {**filtros, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        respuesta = client.get("/results", params=params)
+        assert respuesta.status_code == 200
+        contenido = respuesta.json()
+        paginas.append([fila["resultId"] for fila in contenido["results"]])
+        cursor = contenido["next_cursor"]
+        if cursor is None:
+            return paginas
+        assert len(paginas) <= 100, "la paginación no termina"
+
+
+@pytest.mark.parametrize("limit", [1, 6, 7, 24, 100])
+def test_recorre_todos_los_resultados_sin_duplicados_ni_huecos(client, resultados, limit):
+    paginas = recorrer(client, limit)
+    assert [result_id for pagina in paginas for result_id in pagina] == resultados
+    # Solo la última página puede tener menos filas, y nunca está vacía
+    assert all(len(pagina) == limit for pagina in paginas[:-1])
+    assert 0 < len(paginas[-1]) <= limit
+    assert len(paginas) == -(-len(resultados) // limit)
+
+
+def test_recorre_con_filtros(client, resultados, db_engine):
+    paginas = recorrer(client, 5, raceId=2)
+    with db_engine.connect() as conn:
+        esperados = list(conn.scalars(
+            select(ResultsTB.resultId).where(ResultsTB.raceId == 2).order_by(ResultsTB.resultId)
+        ))
+    assert [result_id for pagina in paginas for result_id in pagina] == esperados
+    assert [len(pagina) for pagina in paginas] == [5, 5, 2]
+
+
+def test_borrar_filas_ya_leidas_no_salta_ninguna(client, resultados, db_engine):
+    primera = client.get("/results", params={"limit": 5}).json()
+    with db_engine.begin() as conn:
+        conn.execute(delete(ResultsTB).where(ResultsTB.resultId.in_(resultados[:3])))
+    segunda = client.get("/results", params={"limit": 5, "cursor": primera["next_cursor"]}).json()
+    assert [fila["resultId"] for fila in segunda["results"]] == resultados[5:10]
+
+
+def test_ultima_pagina_sin_next_cursor(client, resultados):
+    respuesta = client.get("/results", params={"limit": len(resultados)}).json()
+    assert len(respuesta["results"]) == len(resultados)
+    assert respuesta["next_cursor"] is None
+
+
+def test_cursor_con_otros_filtros_devuelve_400(client, resultados):
+    cursor = client.get("/results", params={"limit": 5, "raceId": 1}).json()["next_cursor"]
+    assert cursor is not None
+    assert client.get("/results", params={"limit": 5, "raceId": 1, "cursor": cursor}).status_code == 200
+    for filtros in ({}, {"raceId": 2}, {"raceId": 1, "driverId": 1}):
+        respuesta = client.get("/results", params={"limit": 5, "cursor": cursor, **filtros})
+        assert respuesta.status_code == 400
+        assert "otros filtros" in respuesta.json()["detail"]
+
+
+def codificar(datos):
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-un-cursor",
+    "%%%",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    codificar([1, 2]),
+    codificar(5),
+    codificar({"after": 5}),
+    codificar({"after": "cinco", "f": "x"}),
+])
+def test_cursor_mal_formado_devuelve_400(client, resultados, cursor):
+    respuesta = client.get("/results", params={"limit": 5, "cursor": cursor})
+    assert respuesta.status_code == 400
+    assert "Cursor no válido" in respuesta.json()["detail"]
@@ -0,0 +1,133 @@
+"""
+Pruebas del enrutado de lecturas a las réplicas (replicas.py y
+database.ReplicaSession) con dos ficheros SQLite como réplicas.
+
+Cada base de datos tiene un único circuito con un nombre distinto (Monza en
+el primario, replica-1 y replica-2 en las réplicas), así que GET /circuit_ids
+dice qué base de datos ha atendido la lectura.
+"""
+
+from contextlib import ExitStack
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, insert, select
+
+import cache
+import database
+import formulaUnoBackend
+from models.basemodel import Base
+from models.circuit import CircuitsTB
+from models.results import ResultsTB
+
+
+RESULTADO = {"raceId": 2, "driverId": 1, "constructorId": 1, "statusId": 1, "position": 1, "points": 25}
+
+
+def crear_replica(ruta, nombre):
+    url = f"sqlite:///{ruta}"
+    motor = create_engine(url)
+    Base.metadata.create_all(motor)
+    with motor.begin() as conn:
+        conn.execute(insert(CircuitsTB), [{"circuitId": 1, "circuitRef": nombre, "name": nombre}])
+    motor.dispose()
+    return url
+
+
+@pytest.fixture
+def usar_replicas(db_engine, monkeypatch):
+    """
+    Devuelve una función que sustituye el ReplicaSet de la API por uno con las
+    URLs indicadas y crea la aplicación con su ReplicaMiddleware.
+    """
+    with ExitStack() as pila:
+        def usar(*urls, estrategia="round_robin"):
+            conjunto = database.ReplicaSet(urls)
+            monkeypatch.setattr(database, "replica_set", conjunto)
+            monkeypatch.setattr(formulaUnoBackend, "replica_set", conjunto)
+            monkeypatch.setattr(database, "DB_REPLICA_STRATEGY", estrategia)
+            return pila.enter_context(TestClient(formulaUnoBackend.create_app())), conjunto
+
+        yield usar
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    return [crear_replica(tmp_path / f"replica-{i}.sqlite", f"replica-{i}") for i in (1, 2)]
+
+
+def origen(cliente):
+    respuesta = cliente.get("/circuit_ids")
+    assert respuesta.status_code == 200
+    return respuesta.json()["circuit_ids"][0]["nombre_circuito"]
+
+
+def test_round_robin_reparte_las_lecturas_entre_las_replicas(usar_replicas, replicas):
+    cliente, _ = usar_replicas(*replicas)
+    lecturas = [origen(cliente) for _ in range(4)]
+    assert sorted(lecturas) == ["replica-1", "replica-1", "replica-2", "replica-2"]
+    assert lecturas[0] != lecturas[1]
+
+
+def test_least_busy_elige_la_replica_con_menos_conexiones(usar_replicas, replicas):
+    cliente, conjunto = usar_replicas(*replicas, estrategia="least_busy")
+    conjunto.replicas[0].metrics.in_use = 1
+    assert [origen(cliente) for _ in range(3)] == ["replica-2"] * 3
+
+
+@pytest.mark.parametrize("metodo, ruta, cuerpo, race_id, quedan", [
+    ("POST", "/results/", RESULTADO, 2, 1),
+    ("DELETE", "/results/bulk", {"raceId": 1}, 1, 0),
+])
+def test_tras_una_escritura_el_cliente_lee_del_primario(usar_replicas, replicas, db_engine,
+                                                        metodo, ruta, cuerpo, race_id, quedan):
+    cliente, _ = usar_replicas(*replicas)
+    otro = TestClient(cliente.app)
+    assert origen(cliente).startswith("replica-")
+
+    respuesta = cliente.request(metodo, ruta, json=cuerpo)
+    assert respuesta.status_code == 200
+    assert "db_primary_until" in respuesta.headers["set-cookie"]
+    # La escritura va al primario, y las siguientes lecturas de ese cliente también
+    with db_engine.connect() as conn:
+        assert len(conn.scalars(select(ResultsTB.resultId).where(ResultsTB.raceId == race_id)).all()) == quedan
+    assert [origen(cliente) for _ in range(2)] == ["Monza", "Monza"]
+    # Un cliente sin la cookie sigue leyendo de las réplicas
+    assert origen(otro).startswith("replica-")
+
+
+def test_una_escritura_fallida_no_fija_el_primario(usar_replicas, replicas):
+    cliente, _ = usar_replicas(*replicas)
+    respuesta = cliente.post("/results/", json={**RESULTADO, "raceId": 999})
+    assert respuesta.status_code == 400
+    assert "set-cookie" not in respuesta.headers
+    assert origen(cliente).startswith("replica-")
+
+
+def test_una_replica_caida_pasa_a_la_siguiente(usar_replicas, replicas, tmp_path):
+    caida = f"sqlite:///{tmp_path}/no-existe/replica.sqlite"
+    cliente, conjunto = usar_replicas(caida, replicas[1])
+    assert [origen(cliente) for _ in range(3)] == ["replica-2"] * 3
+    assert [replica.available() for replica in conjunto.replicas] == [False, True]
+
+
+def test_sin_replicas_disponibles_lee_del_primario(usar_replicas, tmp_path):
+    caidas = [f"sqlite:///{tmp_path}/no-existe/replica-{i}.sqlite" for i in (1, 2)]
+    cliente, conjunto = usar_replicas(*caidas)
+    assert [origen(cliente) for _ in range(2)] == ["Monza", "Monza"]
+    assert not any(replica.available() for replica in conjunto.replicas)
+
+
+def test_una_respuesta_cacheada_no_ocupa_conexiones(usar_replicas, replicas, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    cliente, conjunto = usar_replicas(*replicas)
+    conexiones = []
+    for replica in conjunto.replicas:
+        event.listen(replica.sync_engine.pool, "checkout", lambda *args, nombre=replica.name: conexiones.append(nombre))
+
+    assert cliente.get("/circuit_ids").headers["X-Cache"] == "MISS"
+    assert len(conexiones) == 1
+    for _ in range(3):
+        assert cliente.get("/circuit_ids").headers["X-Cache"] == "HIT"
+    assert len(conexiones) == 1
+    assert [replica.metrics.in_use for replica in conjunto.replicas] == [0, 0]
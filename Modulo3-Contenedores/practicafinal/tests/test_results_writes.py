@@ -0,0 +1,204 @@
+"""
+Pruebas de las escrituras en results: inserción sin upsert, upsert (created,
+updated, unchanged, también sobre resultados creados sin clave, y 409 si hay
+varios de la misma carrera y piloto), recuperación de resultados borrados,
+clave en uso por otra transacción y coherencia de los agregados con
+aggregates.rebuild().
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+import aggregates
+import crud
+from models.basemodel import Base
+from models.circuit import CircuitsTB
+from models.drivers import DriversTB
+from models.races import RacesTB
+from models.results import Result, ResultsTB
+from models.standings import CircuitWinsTB, ConstructorStandingsTB, DriverStandingsTB
+
+
+RESULTADO = {"raceId": 2, "driverId": 1, "constructorId": 1, "statusId": 1, "position": 1, "points": 25}
+
+# Base de datos Postgres desechable para la prueba de xmax (opcional)
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL", "")
+
+
+def filas(db_engine, race_id, driver_id):
+    with db_engine.connect() as conn:
+        return conn.execute(
+            select(ResultsTB).where(ResultsTB.raceId == race_id, ResultsTB.driverId == driver_id)
+        ).mappings().all()
+
+
+def agregados(conn):
+    return {
+        tabla.__tablename__: sorted(tuple(fila) for fila in conn.execute(select(tabla)))
+        for tabla in (DriverStandingsTB, ConstructorStandingsTB, CircuitWinsTB)
+    }
+
+
+def comprobar_agregados(db_engine):
+    """
+    Comprueba que los agregados mantenidos en cada escritura coinciden con
+    los que calcula aggregates.rebuild() desde results.
+    """
+    with db_engine.connect() as conn:
+        with conn.begin() as transaccion:
+            actuales = agregados(conn)
+            aggregates.rebuild(conn)
+            assert actuales == agregados(conn)
+            transaccion.rollback()
+
+
+def test_post_sin_upsert_inserta_siempre_sin_clave(client, db_engine):
+    # Coche compartido: dos resultados del mismo piloto en la misma carrera
+    ids = [client.post("/results/", json={**RESULTADO, "points": points}).json()["resultId"] for points in (25, 18)]
+    assert ids[0] != ids[1]
+    assert [(fila["resultId"], fila["idempotencyKey"]) for fila in filas(db_engine, 2, 1)] == [(ids[0], None), (ids[1], None)]
+    comprobar_agregados(db_engine)
+
+
+def test_upsert_actualiza_el_resultado_creado_sin_clave(client, db_engine):
+    result_id = client.post("/results/", json=RESULTADO).json()["resultId"]
+
+    respuesta = client.post("/results/?upsert=true", json={**RESULTADO, "points": 18})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["Idempotency-Status"] == "updated"
+    assert respuesta.json()["resultId"] == result_id
+    fila, = filas(db_engine, 2, 1)
+    assert fila["points"] == 18 and fila["idempotencyKey"] == "race:2:driver:1"
+    comprobar_agregados(db_engine)
+
+
+def test_upsert_rechaza_la_carrera_y_piloto_con_varios_resultados(client, db_engine):
+    # Coche compartido: dos resultados sin clave del mismo piloto y carrera
+    for points in (25, 18):
+        client.post("/results/", json={**RESULTADO, "points": points})
+    # Y un resultado con clave al que luego se añade otro sin clave
+    client.post("/results/?upsert=true", json={**RESULTADO, "driverId": 2})
+    client.post("/results/", json={**RESULTADO, "driverId": 2})
+    antes = [filas(db_engine, 2, driver_id) for driver_id in (1, 2)]
+
+    for driver_id in (1, 2):
+        respuesta = client.post("/results/?upsert=true", json={**RESULTADO, "driverId": driver_id, "points": 10})
+        assert respuesta.status_code == 409
+    items = client.post("/results/bulk?upsert=true", json=[
+        {**RESULTADO, "points": 10}, {**RESULTADO, "driverId": 3, "points": 10},
+    ]).json()["items"]
+    assert [item["status"] for item in items] == ["invalid", "created"]
+    assert [filas(db_engine, 2, driver_id) for driver_id in (1, 2)] == antes
+    comprobar_agregados(db_engine)
+
+
+def test_upsert_created_updated_unchanged(client, db_engine):
+    estados = []
+    for cambios in ({}, {}, {"position": 2, "points": 18}):
+        respuesta = client.post("/results/?upsert=true", json={**RESULTADO, **cambios})
+        assert respuesta.status_code == 200
+        estados.append(respuesta.headers["Idempotency-Status"])
+    assert estados == ["created", "unchanged", "updated"]
+    assert len(filas(db_engine, 2, 1)) == 1
+    comprobar_agregados(db_engine)
+
+
+def test_lote_con_y_sin_upsert(client, db_engine):
+    lote = [RESULTADO, {**RESULTADO, "driverId": 2, "position": 2, "points": 18}]
+    items = client.post("/results/bulk", json=lote).json()["items"]
+    assert [item["status"] for item in items] == ["created", "created"]
+
+    lote = [{**RESULTADO, "points": 10}, lote[1], {**RESULTADO, "raceId": 1, "driverId": 3}, {**RESULTADO, "driverId": 3}]
+    items = client.post("/results/bulk?upsert=true", json=lote).json()["items"]
+    assert [item["status"] for item in items] == ["updated", "unchanged", "unchanged", "created"]
+    assert [fila["points"] for fila in filas(db_engine, 2, 1)] == [10]
+    comprobar_agregados(db_engine)
+
+
+def test_recupera_un_resultado_borrado(client, db_engine, monkeypatch):
+    monkeypatch.setattr(crud, "RESULTS_SOFT_DELETE", True)
+    result_id = client.post("/results/?upsert=true", json=RESULTADO).json()["resultId"]
+    assert client.delete(f"/results/{result_id}").status_code == 200
+    assert filas(db_engine, 2, 1)[0]["deletedAt"] is not None
+    comprobar_agregados(db_engine)
+
+    respuesta = client.post("/results/?upsert=true", json={**RESULTADO, "points": 18})
+    assert respuesta.status_code == 200
+    assert respuesta.json()["resultId"] == result_id
+    assert respuesta.headers["Idempotency-Status"] == "created"
+    fila, = filas(db_engine, 2, 1)
+    assert fila["deletedAt"] is None and fila["points"] == 18
+    comprobar_agregados(db_engine)
+
+
+def test_post_sin_upsert_no_recupera_un_resultado_borrado(client, db_engine, monkeypatch):
+    monkeypatch.setattr(crud, "RESULTS_SOFT_DELETE", True)
+    result_id = client.post("/results/", json=RESULTADO).json()["resultId"]
+    client.delete(f"/results/{result_id}")
+    nuevo_id = client.post("/results/", json=RESULTADO).json()["resultId"]
+    assert nuevo_id != result_id
+    assert [fila["deletedAt"] is None for fila in filas(db_engine, 2, 1)] == [False, True]
+    comprobar_agregados(db_engine)
+
+
+def test_clave_creada_por_otra_transaccion_devuelve_409(client, db_engine, monkeypatch):
+    cargar = crud._cargar
+
+    def cargar_tras_otra_transaccion(db, nuevos, claves):
+        # La fila aparece después de la lectura previa de upsert_results, como
+        # si otra transacción la hubiera confirmado entre medias
+        db.execute(insert(ResultsTB), [{**RESULTADO, "idempotencyKey": clave} for clave in claves])
+        return cargar(db, nuevos, claves)
+
+    monkeypatch.setattr(crud, "_cargar", cargar_tras_otra_transaccion)
+    respuesta = client.post("/results/?upsert=true", json=RESULTADO)
+    assert respuesta.status_code == 409
+    assert filas(db_engine, 2, 1) == []
+    comprobar_agregados(db_engine)
+
+
+def test_agregados_tras_escrituras_mezcladas(client, db_engine, monkeypatch):
+    monkeypatch.setattr(crud, "RESULTS_SOFT_DELETE", True)
+    client.post("/results/", json=RESULTADO)
+    client.post("/results/bulk", json=[{**RESULTADO, "driverId": 2, "position": 2, "points": 18},
+                                       {**RESULTADO, "raceId": 1, "driverId": 1, "position": 2, "points": 18}])
+    client.post("/results/?upsert=true", json={**RESULTADO, "position": 3, "points": 15})
+    client.post("/results/bulk?upsert=true", json=[{**RESULTADO, "driverId": 2},
+                                                   {**RESULTADO, "raceId": 1, "driverId": 2, "position": 3}])
+    client.request("DELETE", "/results/bulk", json={"raceId": 1})
+    client.post("/results/", json={**RESULTADO, "raceId": 1, "driverId": 3, "points": 10})
+    monkeypatch.setattr(crud, "RESULTS_SOFT_DELETE", False)
+    client.request("DELETE", "/results/bulk", json={"resultIds": [fila["resultId"] for fila in filas(db_engine, 2, 2)]})
+    comprobar_agregados(db_engine)
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL no definida")
+def test_xmax_distingue_insertadas_de_actualizadas_en_postgres():
+    """
+    En Postgres _cargar usa xmax = 0 para saber si cada fila se ha insertado.
+    Todo se hace en una transacción que se deshace al terminar.
+    """
+    pg = create_engine(TEST_POSTGRES_URL)
+    ids = 10 ** 9
+    try:
+        with pg.connect() as conn, conn.begin() as transaccion:
+            Base.metadata.create_all(conn)
+            conn.execute(insert(CircuitsTB), [{"circuitId": ids, "circuitRef": f"pruebas-{ids}"}])
+            conn.execute(insert(RacesTB), [{"raceId": ids, "year": 2023, "circuitId": ids}])
+            conn.execute(insert(DriversTB), [{"driverId": ids, "driverRef": f"pruebas-{ids}"}])
+            db = Session(bind=conn)
+            result = Result(**{**RESULTADO, "raceId": ids, "driverId": ids})
+            clave = crud.clave_natural(result)
+
+            (_, result_id, insertada), = crud._cargar(db, [result], [clave])
+            assert insertada
+            (_, mismo_id, insertada), = crud._cargar(db, [result.model_copy(update={"points": 18})], [clave])
+            assert mismo_id == result_id and not insertada
+            assert crud._cargar(db, [result.model_copy(update={"points": 18})], [clave]) == []
+            assert conn.scalar(select(func.count()).where(ResultsTB.idempotencyKey == clave)) == 1
+            transaccion.rollback()
+    finally:
+        pg.dispose()